@@ -3,7 +3,9 @@
 FreeU演示脚本 - 展示核心功能
 """
 
+import os
 import sys
+import asyncio
 import tempfile
 import shutil
 from pathlib import Path
@@ -13,7 +15,7 @@ current_dir = Path(__file__).parent
 src_dir = current_dir / 'src'
 sys.path.insert(0, str(src_dir))
 
-def create_demo_files():
+def create_demo_files(verbose=False):
     """创建演示文件"""
     demo_dir = Path(tempfile.mkdtemp(prefix="freeu_demo_"))
     print(f"📁 创建演示目录: {demo_dir}")
@@ -32,10 +34,17 @@ def create_demo_files():
         ("README.md", "Project documentation")
     ]
     
+    # 直接用 os.open/os.write 写入，省去 Path.write_text 的文本包装层
+    flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
     for filename, content in files:
-        file_path = demo_dir / filename
-        file_path.write_text(content)
-        print(f"  📄 创建文件: {filename}")
+        fd = os.open(os.path.join(demo_dir, filename), flags, 0o644)
+        try:
+            os.write(fd, content.encode())
+        finally:
+            os.close(fd)
+        if verbose:
+            print(f"  📄 创建文件: {filename}")
+    print(f"  📄 已创建 {len(files)} 个演示文件")
     
     return demo_dir
 
@@ -56,7 +65,7 @@ def demo_scanner(demo_dir):
     print(f"  总大小: {summary['total_size']} 字节")
     print(f"  文件类型:")
     
-    for ext, count in sorted(summary['extensions'].items(), key=lambda x: x[1], reverse=True):
+    for ext, count in summary['extensions'].most_common():
         print(f"    {ext}: {count} 个")
     
     return files
@@ -67,16 +76,16 @@ def demo_ai_engine(files):
     print("-" * 40)
     
     try:
-        from src.core.ai_engine import ClaudeAI
+        from src.core.ai_engine import MultiAIEngine
         
         # 检查API Key
         from src.utils.config import config
-        if not config.anthropic_api_key:
-            print("⚠️  未配置Claude API Key，跳过AI演示")
+        if not config.get_active_ai_config():
+            print("⚠️  未配置AI API Key，跳过AI演示")
             print("  如需演示AI功能，请配置API Key")
             return None
         
-        ai = ClaudeAI()
+        ai = MultiAIEngine()
         
         # 测试指令
         instructions = [
@@ -85,30 +94,40 @@ def demo_ai_engine(files):
             "按文件类型分类整理"
         ]
         
-        for instruction in instructions:
+        # 所有指令并发发送，总耗时约为最慢一次请求而非逐个累加
+        responses = asyncio.run(_generate_plans(ai, instructions, files))
+        
+        actions = None
+        for instruction, response in zip(instructions, responses):
             print(f"\n📝 测试指令: {instruction}")
-            try:
-                response = ai.generate_organization_plan(instruction, files)
-                actions = response.actions
-                print(f"  ✅ 生成 {len(actions)} 个操作")
-                
-                for action in actions[:3]:  # 只显示前3个操作
-                    print(f"    📋 {action.source} → {action.destination}")
-                    print(f"       原因: {action.reason}")
+            if isinstance(response, Exception):
+                print(f"  ❌ AI调用失败: {response}")
+                continue
+            
+            actions = response.actions
+            print(f"  ✅ 生成 {len(actions)} 个操作")
+            
+            for action in actions[:3]:  # 只显示前3个操作
+                print(f"    📋 {action.source} → {action.destination}")
+                print(f"       原因: {action.reason}")
+            
+            if len(actions) > 3:
+                print(f"    ... 还有 {len(actions) - 3} 个操作")
                 
-                if len(actions) > 3:
-                    print(f"    ... 还有 {len(actions) - 3} 个操作")
-                    
-            except Exception as e:
-                print(f"  ❌ AI调用失败: {e}")
-                
-        return actions if 'actions' in locals() else None
+        return actions
         
     except Exception as e:
         print(f"❌ AI引擎初始化失败: {e}")
         return None
 
-def demo_file_operations(demo_dir, actions=None):
+async def _generate_plans(ai, instructions, files):
+    """并发生成多个指令的整理方案"""
+    return await asyncio.gather(
+        *(ai.agenerate_organization_plan(instruction, files) for instruction in instructions),
+        return_exceptions=True
+    )
+
+def demo_file_operations(demo_dir, files, actions=None):
     """演示文件操作功能"""
     print(f"\n⚙️  演示文件操作功能")
     print("-" * 40)
@@ -144,13 +163,8 @@ def demo_file_operations(demo_dir, actions=None):
     
     print(f"🎯 测试操作数量: {len(test_actions)}")
     
-    # 模拟可用文件列表
-    from src.core.scanner import DirectoryScanner
-    scanner = DirectoryScanner(demo_dir)
-    available_files = scanner.scan_directory(recursive=False)
-    
-    # 执行操作
-    results = executor.execute_actions(test_actions, available_files)
+    # 执行操作（复用 demo_scanner 的扫描结果，不再重复扫描）
+    results = executor.execute_actions(test_actions, files)
     
     print(f"📊 执行结果:")
     success_count = sum(1 for r in results if r["success"])
@@ -184,7 +198,7 @@ def main():
         actions = demo_ai_engine(files)
         
         # 演示文件操作
-        results = demo_file_operations(demo_dir, actions)
+        results = demo_file_operations(demo_dir, files, actions)
         
         print(f"\n🎉 演示完成！")
         print(f"📁 演示目录: {demo_dir}")
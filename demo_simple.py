@@ -3,6 +3,7 @@
 FreeU简化演示 - 不依赖AI功能
 """
 
+import os
 import sys
 import tempfile
 import shutil
@@ -13,7 +14,7 @@ current_dir = Path(__file__).parent
 src_dir = current_dir / 'src'
 sys.path.insert(0, str(src_dir))
 
-def create_demo_files():
+def create_demo_files(verbose=False):
     """创建演示文件"""
     demo_dir = Path(tempfile.mkdtemp(prefix="freeu_demo_"))
     print(f"📁 创建演示目录: {demo_dir}")
@@ -32,10 +33,17 @@ def create_demo_files():
         ("README.md", "Project documentation")
     ]
     
+    # 直接用 os.open/os.write 写入，省去 Path.write_text 的文本包装层
+    flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
     for filename, content in files:
-        file_path = demo_dir / filename
-        file_path.write_text(content)
-        print(f"  📄 创建文件: {filename}")
+        fd = os.open(os.path.join(demo_dir, filename), flags, 0o644)
+        try:
+            os.write(fd, content.encode())
+        finally:
+            os.close(fd)
+        if verbose:
+            print(f"  📄 创建文件: {filename}")
+    print(f"  📄 已创建 {len(files)} 个演示文件")
     
     return demo_dir
 
@@ -56,7 +64,7 @@ def demo_scanner(demo_dir):
     print(f"  总大小: {summary['total_size']} 字节")
     print(f"  文件类型:")
     
-    for ext, count in sorted(summary['extensions'].items(), key=lambda x: x[1], reverse=True):
+    for ext, count in summary['extensions'].most_common():
         print(f"    {ext}: {count} 个")
     
     return files
@@ -154,12 +162,13 @@ def demo_unique_filename(demo_dir):
     
     print(f"📄 已存在文件: {existing_file}")
     
-    # 生成唯一文件名
-    new_path = executor._generate_unique_filename(existing_file)
+    # 占用唯一文件名（创建空占位文件，移动时源文件会替换到它上面）
+    new_path = executor._claim_unique_path(existing_file)
     print(f"🆕 生成的唯一文件名: {new_path.name}")
     
-    # 验证文件不存在
-    print(f"✅ 文件不存在: {not new_path.exists()}")
+    # 验证原文件未被占用，演示结束后删除占位文件
+    print(f"✅ 未覆盖已存在文件: {new_path != existing_file}")
+    new_path.unlink()
 
 def main():
     """主演示函数"""
@@ -188,13 +197,15 @@ def main():
         
         # 显示目录结构
         print(f"\n📂 最终目录结构:")
-        for item in sorted(demo_dir.rglob("*")):
-            if item.is_file():
-                rel_path = item.relative_to(demo_dir)
-                print(f"  📄 {rel_path}")
-            elif item.is_dir() and item != demo_dir:
-                rel_path = item.relative_to(demo_dir)
-                print(f"  📁 {rel_path}/")
+        # 深度优先边遍历边输出，只对每层目录排序，无需收集整棵树
+        root_prefix_len = len(str(demo_dir)) + 1
+        for root, dirs, filenames in os.walk(demo_dir):
+            dirs.sort()
+            rel_root = root[root_prefix_len:]
+            if rel_root:
+                print(f"  📁 {rel_root}/")
+            for filename in sorted(filenames):
+                print(f"  📄 {os.path.join(rel_root, filename)}")
         
         # 询问是否清理演示文件
         print(f"\n🧹 演示文件位于: {demo_dir}")
@@ -11,28 +11,25 @@ import shutil
 from pathlib import Path
 
 def run_command(cmd, cwd=None):
-    """运行命令"""
-    print(f"运行命令: {cmd}")
+    """运行命令（字符串经shell执行，参数列表直接执行）"""
+    shell = isinstance(cmd, str)
+    print(f"运行命令: {cmd if shell else subprocess.list2cmdline(cmd)}")
     try:
-        result = subprocess.run(
+        # 子进程直接继承当前的 stdout/stderr，输出实时显示且不在内存中缓存
+        subprocess.run(
             cmd, 
-            shell=True, 
+            shell=shell, 
             cwd=cwd, 
-            check=True, 
-            capture_output=True, 
-            text=True
+            check=True
         )
-        print(result.stdout)
         return True
     except subprocess.CalledProcessError as e:
         print(f"命令执行失败: {e}")
-        print(f"stdout: {e.stdout}")
-        print(f"stderr: {e.stderr}")
         return False
 
 def install_dependencies():
-    """安装依赖"""
-    print("📦 安装Python依赖...")
+    """安装依赖（项目依赖与PyInstaller一次性解析安装）"""
+    print("📦 安装Python依赖和PyInstaller...")
     
     # 检查pip
     if not run_command("pip --version"):
@@ -45,12 +42,9 @@ def install_dependencies():
         print(f"❌ 找不到requirements.txt: {requirements_file}")
         return False
     
-    return run_command(f"pip install -r {requirements_file}")
-
-def install_pyinstaller():
-    """安装PyInstaller"""
-    print("📦 安装PyInstaller...")
-    return run_command("pip install pyinstaller")
+    return run_command(
+        f"pip install --disable-pip-version-check --no-input -q -r {requirements_file} pyinstaller"
+    )
 
 def build_backend():
     """构建后端"""
@@ -76,28 +70,19 @@ def build_backend():
         "--clean",  # 清理临时文件
         "--noconfirm",  # 不确认覆盖
         # 包含数据文件
-        "--add-data", f"{src_dir}/core:core",
-        "--add-data", f"{src_dir}/ui:ui", 
-        "--add-data", f"{src_dir}/utils:utils",
+        # PyInstaller 的 --add-data 分隔符与 os.pathsep 一致（Windows为;，其他平台为:）
+        "--add-data", f"{src_dir / 'core'}{os.pathsep}core",
+        "--add-data", f"{src_dir / 'ui'}{os.pathsep}ui",
+        "--add-data", f"{src_dir / 'utils'}{os.pathsep}utils",
         # 隐藏导入
         "--hidden-import", "anthropic",
         "--hidden-import", "gradio",
-        "--hidden-import", "pydantic",
         "--hidden-import", "pathlib",
         str(main_script)
     ]
     
-    # 根据平台调整命令
-    if sys.platform == "win32":
-        # Windows平台使用分号分隔路径
-        build_cmd = [cmd.replace(":", ";") if ":" in cmd and "add-data" in build_cmd[build_cmd.index(cmd)-1] else cmd for cmd in build_cmd]
-    
-    cmd_str = " ".join(build_cmd)
-    
-    print(f"构建命令: {cmd_str}")
-    
-    # 运行构建命令
-    if not run_command(cmd_str, cwd=project_root):
+    # 运行构建命令（以参数列表直接执行，不经过shell，路径中的空格无需转义）
+    if not run_command(build_cmd, cwd=project_root):
         print("❌ PyInstaller构建失败")
         return False
     
@@ -140,22 +125,17 @@ def main():
     
     print(f"Python版本: {sys.version}")
     
-    # 步骤1: 安装依赖
+    # 步骤1: 安装依赖和PyInstaller
     if not install_dependencies():
         print("❌ 依赖安装失败")
         return False
     
-    # 步骤2: 安装PyInstaller
-    if not install_pyinstaller():
-        print("❌ PyInstaller安装失败")
-        return False
-    
-    # 步骤3: 构建后端
+    # 步骤2: 构建后端
     if not build_backend():
         print("❌ 后端构建失败")
         return False
     
-    # 步骤4: 复制到Electron目录
+    # 步骤3: 复制到Electron目录
     if not copy_to_electron():
         print("❌ 复制失败")
         return False
@@ -3,51 +3,53 @@ AI提供商统一接口适配器
 支持多种AI服务：Claude、OpenAI、Kimi、GLM、OpenRouter等
 """
 
-import json
+import atexit
+import asyncio
 import logging
+import threading
+import importlib.util
 from abc import ABC, abstractmethod
-from typing import List, Dict, Optional, Any
+from collections import Counter, defaultdict
+from functools import lru_cache, partial
+from typing import List, Dict, Optional, Any, Iterable, Iterator, Tuple, Union
 from enum import Enum
 
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    from json import loads as _json_loads
+
 from src.core.scanner import FileInfo
 
 logger = logging.getLogger(__name__)
 
-class AIProvider(Enum):
-    """AI提供商枚举"""
-    CLAUDE = "claude"
-    OPENAI = "openai"
-    KIMI = "kimi"
-    GLM = "glm"
-    OPENROUTER = "openrouter"
+# 文件大小单位，下标 i 对应 1024**i 字节
+_SIZE_UNITS = ('B', 'KB', 'MB', 'GB', 'TB')
 
-class BaseAIAdapter(ABC):
-    """AI适配器基类"""
-    
-    def __init__(self, api_key: str, model: str = None):
-        self.api_key = api_key
-        self.model = model or self.get_default_model()
-        self.client = None
-        self._initialize_client()
-    
-    @abstractmethod
-    def get_default_model(self) -> str:
-        """获取默认模型"""
-        pass
-    
-    @abstractmethod
-    def _initialize_client(self):
-        """初始化客户端"""
-        pass
-    
-    @abstractmethod
-    def generate_organization_plan(self, user_instruction: str, files: List[FileInfo]) -> Dict[str, Any]:
-        """生成文件整理方案"""
-        pass
-    
-    def _build_system_prompt(self) -> str:
-        """构建系统提示词（通用）"""
-        return """你是 FreeU 文件整理助手，负责根据用户指令生成文件整理方案。
+def format_file_size(size: int) -> str:
+    """格式化文件大小"""
+    # bit_length 直接定位单位（每 10 位为一级），无需循环除以 1024
+    unit = min(max(size.bit_length() - 1, 0) // 10, len(_SIZE_UNITS) - 1)
+    return f"{size / (1 << (unit * 10)):.1f} {_SIZE_UNITS[unit]}"
+
+# 文件列表以 TSV 发给模型：字节数和时间戳不做人类可读格式化，每个文件占用的 token 更少
+FILE_TABLE_HEADER = "path\tbytes\tmtime_epoch"
+
+def build_file_table(files: Iterable[FileInfo]) -> str:
+    """把文件列表构建为带表头的 TSV 文本"""
+    rows = "\n".join(
+        f"{file.path}\t{file.size}\t{int(file.modified_time.timestamp()) if file.modified_time else ''}"
+        for file in files
+    )
+    return f"{FILE_TABLE_HEADER}\n{rows}"
+
+# 系统提示词（导入时构建一次，所有适配器和引擎共用同一个字符串对象）
+SYSTEM_PROMPT_ZH = """你是 FreeU 文件整理助手，负责根据用户指令生成文件整理方案。
 
 【角色定义】
 - 只处理本地文件整理任务
@@ -67,6 +69,12 @@ class BaseAIAdapter(ABC):
   ]
 }
 
+【文件列表格式】
+文件列表为制表符分隔的 TSV，首行是表头：
+- path：文件相对于基础目录的路径，source 必须原样使用该值（子目录中的文件包含目录部分）
+- bytes：文件大小（字节）
+- mtime_epoch：修改时间（Unix 时间戳，秒）
+
 【操作规则】
 1. 只移动文件，不移动目录
 2. 目标路径使用相对路径，相对于用户指定的基础目录
@@ -94,247 +102,491 @@ class BaseAIAdapter(ABC):
   ]
 }"""
 
-    def _build_user_prompt(self, user_instruction: str, files: List[FileInfo]) -> str:
-        """构建用户提示词"""
-        # 构建文件列表字符串
-        file_list = []
-        for file in files:
-            file_info = f"- {file.name} (大小: {self._format_file_size(file.size)}, 修改时间: {file.modified_time.strftime('%Y-%m-%d %H:%M:%S')})"
-            file_list.append(file_info)
-        
-        files_str = "\n".join(file_list)
-        
-        return f"""用户指令：{user_instruction}
 
-当前目录下的文件：
-{files_str}
+# 扩展名 → 目标文件夹，与系统提示词中的【分类建议】保持一致
+EXT_CATEGORY = {
+    **dict.fromkeys(('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.svg', '.webp'), 'Pictures'),
+    **dict.fromkeys(('.pdf', '.doc', '.docx', '.txt', '.rtf'), 'Documents'),
+    **dict.fromkeys(('.mp4', '.avi', '.mov', '.mkv', '.wmv'), 'Videos'),
+    **dict.fromkeys(('.mp3', '.wav', '.flac', '.aac', '.m4a'), 'Music'),
+    **dict.fromkeys(('.zip', '.rar', '.7z', '.tar', '.gz'), 'Archives'),
+    **dict.fromkeys(('.xls', '.xlsx', '.csv'), 'Spreadsheets'),
+    **dict.fromkeys(('.ppt', '.pptx'), 'Presentations'),
+}
+
+# 按服务地址共享的底层HTTP连接池，同一提供商的多个适配器实例复用已建立的连接
+_TRANSPORTS: Dict[str, Any] = {}
+_TRANSPORTS_LOCK = threading.Lock()
 
-请根据用户指令生成文件整理方案。只返回 JSON 格式，不要包含其他解释。"""
+def _shared_http_client(endpoint: str):
+    """创建复用共享连接池的同步HTTP客户端
     
-    def _format_file_size(self, size: int) -> str:
-        """格式化文件大小"""
-        for unit in ['B', 'KB', 'MB', 'GB']:
-            if size < 1024.0:
-                return f"{size:.1f} {unit}"
-            size /= 1024.0
-        return f"{size:.1f} TB"
+    异步客户端的连接绑定在创建它的事件循环上，不能跨 asyncio.run 共享，
+    因此只共享同步传输层。
+    """
+    import httpx
+    with _TRANSPORTS_LOCK:
+        transport = _TRANSPORTS.get(endpoint)
+        if transport is None:
+            transport = httpx.HTTPTransport(
+                http2=importlib.util.find_spec("h2") is not None,
+                limits=httpx.Limits(max_keepalive_connections=20)
+            )
+            _TRANSPORTS[endpoint] = transport
+    return httpx.Client(transport=transport)
 
-class ClaudeAdapter(BaseAIAdapter):
-    """Claude AI适配器"""
+@atexit.register
+def _close_shared_transports() -> None:
+    """进程退出时关闭共享连接池中的连接"""
+    with _TRANSPORTS_LOCK:
+        for transport in _TRANSPORTS.values():
+            transport.close()
+        _TRANSPORTS.clear()
+
+def _iter_stream_actions(chunks: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """从流式文本片段中增量解析 actions 数组中的每个操作"""
+    if ijson is None:
+        # 未安装ijson时退化为完整接收后一次性解析
+        data = _json_loads("".join(chunks))
+        yield from data.get("actions", [])
+        return
     
+    parsed = ijson.sendable_list()
+    parser = ijson.items_coro(parsed, "actions.item")
+    for chunk in chunks:
+        parser.send(chunk.encode("utf-8"))
+        yield from parsed
+        del parsed[:]
+    parser.close()
+    yield from parsed
+
+class AIProvider(Enum):
+    """AI提供商枚举"""
+    CLAUDE = "claude"
+    OPENAI = "openai"
+    KIMI = "kimi"
+    GLM = "glm"
+    OPENROUTER = "openrouter"
+
+class BaseAIAdapter(ABC):
+    """AI适配器基类"""
+    
+    # 超过该文件数时，提示词改为按扩展名汇总
+    SUMMARY_THRESHOLD = 200
+    # 汇总模式下每个扩展名附带的示例文件数
+    SUMMARY_EXAMPLES = 3
+    
+    # 日志中显示的提供商名称
+    provider_name = "AI"
+    
+    # 系统提示词对所有请求保持不变，作为请求前缀以命中提供商的提示词缓存
+    SYSTEM_PROMPT = SYSTEM_PROMPT_ZH
+    
+    def __init__(self, api_key: str, model: str = None):
+        self.api_key = api_key
+        self.model = model or self.get_default_model()
+        self.client = None
+        self.async_client = None
+        self._async_loop = None
+        self._initialize_client()
+    
+    @abstractmethod
     def get_default_model(self) -> str:
-        return "claude-3-5-sonnet-20241022"
+        """获取默认模型"""
+        pass
     
+    @abstractmethod
     def _initialize_client(self):
-        """初始化Claude客户端"""
-        try:
-            from anthropic import Anthropic
-            self.client = Anthropic(api_key=self.api_key)
-        except ImportError:
-            raise ValueError("请安装anthropic库: pip install anthropic")
+        """初始化客户端"""
+        pass
+    
+    @abstractmethod
+    def _create_async_client(self):
+        """创建异步客户端"""
+        pass
+    
+    def _get_async_client(self):
+        """获取绑定到当前事件循环的异步客户端
+        
+        异步连接池不能跨事件循环复用；适配器被多个 asyncio.run 共享时，
+        换了事件循环就重建客户端，同一循环内的请求仍复用连接。
+        """
+        loop = asyncio.get_running_loop()
+        if self.async_client is None or self._async_loop is not loop:
+            self.async_client = self._create_async_client()
+            self._async_loop = loop
+        return self.async_client
+    
+    @abstractmethod
+    def _request_text(self, system_prompt: str, user_prompt: str) -> str:
+        """请求模型，返回完整响应文本"""
+        pass
+    
+    @abstractmethod
+    async def _arequest_text(self, system_prompt: str, user_prompt: str) -> str:
+        """异步请求模型，返回完整响应文本"""
+        pass
+    
+    @abstractmethod
+    def _stream_text(self, system_prompt: str, user_prompt: str) -> Iterator[str]:
+        """以流式方式请求模型，逐段返回响应文本"""
+        pass
     
-    def generate_organization_plan(self, user_instruction: str, files: List[FileInfo]) -> Dict[str, Any]:
-        """生成Claude整理方案"""
+    @abstractmethod
+    async def aping(self) -> None:
+        """发送尽量轻量的请求验证 API Key 和网络连通性，失败时抛出异常"""
+        pass
+    
+    def generate_organization_plan(self, user_instruction: str, files: List[FileInfo], full_list: Optional[bool] = None) -> Dict[str, Any]:
+        """生成文件整理方案"""
         system_prompt = self._build_system_prompt()
-        user_prompt = self._build_user_prompt(user_instruction, files)
+        user_prompt = self._build_user_prompt(user_instruction, files, full_list)
         
         try:
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=4096,
-                temperature=0.1,
-                system=system_prompt,
-                messages=[{"role": "user", "content": user_prompt}]
-            )
-            
-            content = response.content[0].text
-            return json.loads(content)
-            
+            return _json_loads(self._request_text(system_prompt, user_prompt))
         except Exception as e:
-            logger.error(f"Claude API调用失败: {e}")
+            logger.error(f"{self.provider_name} API调用失败: {e}")
             raise
-
-class OpenAIAdapter(BaseAIAdapter):
-    """OpenAI适配器"""
-    
-    def get_default_model(self) -> str:
-        return "gpt-4-turbo-preview"
-    
-    def _initialize_client(self):
-        """初始化OpenAI客户端"""
-        try:
-            from openai import OpenAI
-            self.client = OpenAI(api_key=self.api_key)
-        except ImportError:
-            raise ValueError("请安装openai库: pip install openai")
     
-    def generate_organization_plan(self, user_instruction: str, files: List[FileInfo]) -> Dict[str, Any]:
-        """生成OpenAI整理方案"""
+    async def agenerate_organization_plan(self, user_instruction: str, files: List[FileInfo], full_list: Optional[bool] = None) -> Dict[str, Any]:
+        """异步生成文件整理方案（可与其他请求并发）"""
         system_prompt = self._build_system_prompt()
-        user_prompt = self._build_user_prompt(user_instruction, files)
+        user_prompt = self._build_user_prompt(user_instruction, files, full_list)
         
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                max_tokens=4096,
-                temperature=0.1
-            )
-            
-            content = response.choices[0].message.content
-            return json.loads(content)
-            
+            return _json_loads(await self._arequest_text(system_prompt, user_prompt))
         except Exception as e:
-            logger.error(f"OpenAI API调用失败: {e}")
+            logger.error(f"{self.provider_name} API调用失败: {e}")
             raise
-
-class KimiAdapter(BaseAIAdapter):
-    """Kimi (Moonshot) 适配器"""
     
-    def get_default_model(self) -> str:
-        return "moonshot-v1-8k"
-    
-    def _initialize_client(self):
-        """初始化Kimi客户端"""
+    def generate_batch_plans(self, tasks: List[Tuple[str, List[FileInfo]]], full_list: Optional[bool] = None) -> Dict[str, Any]:
+        """在一次请求中为多个 (指令, 文件列表) 任务生成整理方案
+        
+        返回 {"results": [{"task_id": 1, "actions": [...]}, ...]}，task_id 从 1 开始。
+        """
+        system_prompt = self._build_system_prompt()
+        user_prompt = self._build_batch_prompt(tasks, full_list)
+        
         try:
-            from openai import OpenAI
-            self.client = OpenAI(
-                api_key=self.api_key,
-                base_url="https://api.moonshot.cn/v1"
-            )
-        except ImportError:
-            raise ValueError("请安装openai库: pip install openai")
+            return _json_loads(self._request_text(system_prompt, user_prompt))
+        except Exception as e:
+            logger.error(f"{self.provider_name} 批量API调用失败: {e}")
+            raise
     
-    def generate_organization_plan(self, user_instruction: str, files: List[FileInfo]) -> Dict[str, Any]:
-        """生成Kimi整理方案"""
-        # Kimi使用与OpenAI兼容的API格式
+    def stream_organization_plan(self, user_instruction: str, files: List[FileInfo], full_list: Optional[bool] = None) -> Iterator[Dict[str, Any]]:
+        """流式生成整理方案，每解析出一个操作就立即产出，无需等待完整响应"""
         system_prompt = self._build_system_prompt()
-        user_prompt = self._build_user_prompt(user_instruction, files)
+        user_prompt = self._build_user_prompt(user_instruction, files, full_list)
         
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                max_tokens=4096,
-                temperature=0.1
-            )
-            
-            content = response.choices[0].message.content
-            return json.loads(content)
-            
+            yield from _iter_stream_actions(self._stream_text(system_prompt, user_prompt))
         except Exception as e:
-            logger.error(f"Kimi API调用失败: {e}")
+            logger.error(f"{self.provider_name} 流式调用失败: {e}")
             raise
+    
+    def classify_fast(self, files: List[FileInfo]) -> Tuple[List[Dict[str, str]], List[FileInfo]]:
+        """按扩展名在本地直接分类，返回 (操作列表, 需要交给AI判断的文件)
+        
+        目标保留文件的相对路径（trip/a.jpg → Pictures/trip/a.jpg），不压平子目录；
+        已位于目标文件夹下（含其子目录）的文件视为已整理，不生成操作；目录和未知扩展名的文件留给AI。
+        """
+        actions = []
+        unresolved = []
+        for file in files:
+            category = None if file.is_directory else EXT_CATEGORY.get(file.extension.lower())
+            if category is None:
+                unresolved.append(file)
+                continue
+            path = file.path.replace("\\", "/")
+            if path.startswith(category + "/"):
+                continue
+            actions.append({
+                "action_type": "move",
+                "source": file.path,
+                "destination": f"{category}/{path}",
+                "reason": "按扩展名归类"
+            })
+        return actions, unresolved
+    
+    def _build_system_prompt(self) -> str:
+        """构建系统提示词（通用）"""
+        return self.SYSTEM_PROMPT
+
+    def _build_user_prompt(self, user_instruction: str, files: List[FileInfo], full_list: Optional[bool] = None) -> str:
+        """构建用户提示词
+        
+        full_list 为 None 时按文件数量自动选择：文件较少时逐个列出，
+        超过 SUMMARY_THRESHOLD 时按扩展名汇总，避免提示词随文件数线性膨胀。
+        """
+        return self._build_task_prompt(user_instruction, files, full_list) + "只返回 JSON 格式，不要包含其他解释。"
+    
+    def _build_batch_prompt(self, tasks: List[Tuple[str, List[FileInfo]]], full_list: Optional[bool] = None) -> str:
+        """构建多任务合并的用户提示词"""
+        sections = "\n\n".join(
+            f"### 任务 {task_id}\n{self._build_task_prompt(user_instruction, files, full_list)}"
+            for task_id, (user_instruction, files) in enumerate(tasks, 1)
+        )
+        
+        return f"""以下共有 {len(tasks)} 个相互独立的整理任务，请分别生成整理方案。
+
+{sections}
 
-class GLMAdapter(BaseAIAdapter):
-    """GLM (智谱) 适配器"""
+只返回如下 JSON 格式，每个任务一项，actions 的格式与单个任务相同，不要包含其他解释：
+{{"results": [{{"task_id": 1, "actions": [...]}}]}}"""
+    
+    def _build_task_prompt(self, user_instruction: str, files: List[FileInfo], full_list: Optional[bool] = None) -> str:
+        """构建单个任务的指令和文件列表部分（不含输出格式要求）"""
+        if full_list is None:
+            full_list = len(files) <= self.SUMMARY_THRESHOLD
+        
+        if not full_list:
+            return self._build_summary_prompt(user_instruction, files)
+        
+        return f"""用户指令：{user_instruction}
+
+当前目录下的文件（TSV）：
+{build_file_table(files)}
+
+请根据用户指令生成文件整理方案。"""
+    
+    def _build_summary_prompt(self, user_instruction: str, files: List[FileInfo]) -> str:
+        """构建按扩展名汇总的用户提示词"""
+        # 每个扩展名只保留数量和前几个示例，不为所有文件名建列表
+        counts = Counter()
+        samples = defaultdict(list)
+        for file in files:
+            if not file.is_directory:
+                ext = file.extension.lower()
+                counts[ext] += 1
+                names = samples[ext]
+                if len(names) < self.SUMMARY_EXAMPLES:
+                    names.append(file.name)
+        
+        lines = []
+        for ext, count in counts.most_common():
+            examples = ", ".join(samples[ext])
+            label = ext or "无扩展名"
+            lines.append(f"- {label}: {count} 个文件, 例如 {examples}")
+        summary_str = "\n".join(lines)
+        
+        return f"""用户指令：{user_instruction}
+
+当前目录下共有 {len(files)} 个项目，已按扩展名汇总：
+{summary_str}
+
+文件较多，请按扩展名生成整理方案：source 写作通配符 "*.扩展名"（例如 "*.jpg"），
+destination 写目标文件夹并以 "/" 结尾（例如 "Pictures/"），程序会把规则展开到每个文件，
+并保留文件在子目录中的相对路径。没有扩展名的文件 source 写作 "*."。"""
+    
+    _format_file_size = staticmethod(format_file_size)
+
+class ClaudeAdapter(BaseAIAdapter):
+    """Claude AI适配器"""
+    
+    provider_name = "Claude"
+    
+    # 旧版 anthropic SDK 需要显式开启提示词缓存测试特性，新版会忽略该头
+    PROMPT_CACHE_HEADERS = {"anthropic-beta": "prompt-caching-2024-07-31"}
     
     def get_default_model(self) -> str:
-        return "glm-4"
+        return "claude-3-5-sonnet-20241022"
     
     def _initialize_client(self):
-        """初始化GLM客户端"""
+        """初始化Claude客户端"""
         try:
-            from openai import OpenAI
-            self.client = OpenAI(
-                api_key=self.api_key,
-                base_url="https://open.bigmodel.cn/api/paas/v4"
-            )
+            from anthropic import Anthropic
+            self.client = Anthropic(api_key=self.api_key, http_client=_shared_http_client("anthropic"))
         except ImportError:
-            raise ValueError("请安装openai库: pip install openai")
+            raise ValueError("请安装anthropic库: pip install anthropic")
     
-    def generate_organization_plan(self, user_instruction: str, files: List[FileInfo]) -> Dict[str, Any]:
-        """生成GLM整理方案"""
-        system_prompt = self._build_system_prompt()
-        user_prompt = self._build_user_prompt(user_instruction, files)
-        
-        try:
-            response = self.client.chat.completions.create(
+    def _create_async_client(self):
+        """创建Claude异步客户端"""
+        from anthropic import AsyncAnthropic
+        return AsyncAnthropic(api_key=self.api_key)
+    
+    def _build_system_blocks(self, system_prompt: str) -> List[Dict[str, Any]]:
+        """构建带缓存标记的系统提示词块，静态前缀在服务端缓存后后续请求按缓存读取计费"""
+        return [{
+            "type": "text",
+            "text": system_prompt,
+            "cache_control": {"type": "ephemeral"}
+        }]
+    
+    def _request_text(self, system_prompt: str, user_prompt: str) -> str:
+        """请求Claude"""
+        response = self.client.messages.create(
+            model=self.model,
+            max_tokens=4096,
+            temperature=0.1,
+            system=self._build_system_blocks(system_prompt),
+            messages=[{"role": "user", "content": user_prompt}],
+            extra_headers=self.PROMPT_CACHE_HEADERS
+        )
+        return response.content[0].text
+    
+    async def _arequest_text(self, system_prompt: str, user_prompt: str) -> str:
+        """异步请求Claude"""
+        response = await self._get_async_client().messages.create(
+            model=self.model,
+            max_tokens=4096,
+            temperature=0.1,
+            system=self._build_system_blocks(system_prompt),
+            messages=[{"role": "user", "content": user_prompt}],
+            extra_headers=self.PROMPT_CACHE_HEADERS
+        )
+        return response.content[0].text
+    
+    def _stream_text(self, system_prompt: str, user_prompt: str) -> Iterator[str]:
+        """流式请求Claude"""
+        with self.client.messages.stream(
+            model=self.model,
+            max_tokens=4096,
+            temperature=0.1,
+            system=self._build_system_blocks(system_prompt),
+            messages=[{"role": "user", "content": user_prompt}],
+            extra_headers=self.PROMPT_CACHE_HEADERS
+        ) as stream:
+            yield from stream.text_stream
+    
+    async def aping(self) -> None:
+        """验证Claude连接：列出模型不消耗token，旧版SDK没有模型接口时发送只生成1个token的请求"""
+        client = self._get_async_client()
+        if hasattr(client, "models"):
+            await client.models.list(limit=1)
+        else:
+            await client.messages.create(
                 model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                max_tokens=4096,
-                temperature=0.1
+                max_tokens=1,
+                messages=[{"role": "user", "content": "ping"}]
             )
-            
-            content = response.choices[0].message.content
-            return json.loads(content)
-            
-        except Exception as e:
-            logger.error(f"GLM API调用失败: {e}")
-            raise
 
-class OpenRouterAdapter(BaseAIAdapter):
-    """OpenRouter适配器"""
+class OpenAICompatibleAdapter(BaseAIAdapter):
+    """OpenAI兼容接口适配器（OpenAI、Kimi、GLM、OpenRouter共用）"""
+    
+    def __init__(self, api_key: str, model: str = None, base_url: str = None,
+                 default_model: str = "gpt-4-turbo-preview", provider_name: str = "OpenAI"):
+        self.base_url = base_url
+        self.default_model = default_model
+        self.provider_name = provider_name
+        super().__init__(api_key, model)
     
     def get_default_model(self) -> str:
-        return "anthropic/claude-3.5-sonnet"
+        return self.default_model
     
     def _initialize_client(self):
-        """初始化OpenRouter客户端"""
+        """初始化OpenAI兼容客户端"""
         try:
             from openai import OpenAI
             self.client = OpenAI(
                 api_key=self.api_key,
-                base_url="https://openrouter.ai/api/v1"
+                base_url=self.base_url,
+                http_client=_shared_http_client(self.base_url or "openai")
             )
         except ImportError:
             raise ValueError("请安装openai库: pip install openai")
     
-    def generate_organization_plan(self, user_instruction: str, files: List[FileInfo]) -> Dict[str, Any]:
-        """生成OpenRouter整理方案"""
-        system_prompt = self._build_system_prompt()
-        user_prompt = self._build_user_prompt(user_instruction, files)
-        
+    def _create_async_client(self):
+        """创建OpenAI兼容异步客户端"""
+        from openai import AsyncOpenAI
+        return AsyncOpenAI(api_key=self.api_key, base_url=self.base_url)
+    
+    def _build_messages(self, system_prompt: str, user_prompt: str) -> List[Dict[str, str]]:
+        """构建消息列表，系统提示词固定在首位以命中提供商的前缀缓存"""
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+    
+    def _request_text(self, system_prompt: str, user_prompt: str) -> str:
+        """请求OpenAI兼容接口"""
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=self._build_messages(system_prompt, user_prompt),
+            max_tokens=4096,
+            temperature=0.1
+        )
+        return response.choices[0].message.content
+    
+    async def _arequest_text(self, system_prompt: str, user_prompt: str) -> str:
+        """异步请求OpenAI兼容接口"""
+        response = await self._get_async_client().chat.completions.create(
+            model=self.model,
+            messages=self._build_messages(system_prompt, user_prompt),
+            max_tokens=4096,
+            temperature=0.1
+        )
+        return response.choices[0].message.content
+    
+    def _stream_text(self, system_prompt: str, user_prompt: str) -> Iterator[str]:
+        """流式请求OpenAI兼容接口"""
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=self._build_messages(system_prompt, user_prompt),
+            max_tokens=4096,
+            temperature=0.1,
+            stream=True
+        )
+        for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    
+    async def aping(self) -> None:
+        """验证连接：请求模型列表（GET /models）不消耗token，提供商不支持该接口时发送只生成1个token的请求"""
+        from openai import NotFoundError
+        client = self._get_async_client()
         try:
-            response = self.client.chat.completions.create(
+            await client.models.list()
+        except NotFoundError:
+            await client.chat.completions.create(
                 model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                max_tokens=4096,
-                temperature=0.1
+                messages=[{"role": "user", "content": "ping"}],
+                max_tokens=1
             )
-            
-            content = response.choices[0].message.content
-            return json.loads(content)
-            
-        except Exception as e:
-            logger.error(f"OpenRouter API调用失败: {e}")
-            raise
 
 class AIAdapterFactory:
     """AI适配器工厂"""
     
     _adapters = {
-        AIProvider.CLAUDE: ClaudeAdapter,
-        AIProvider.OPENAI: OpenAIAdapter,
-        AIProvider.KIMI: KimiAdapter,
-        AIProvider.GLM: GLMAdapter,
-        AIProvider.OPENROUTER: OpenRouterAdapter,
+        AIProvider.CLAUDE.value: ClaudeAdapter,
+        AIProvider.OPENAI.value: partial(
+            OpenAICompatibleAdapter,
+            default_model="gpt-4-turbo-preview",
+            provider_name="OpenAI"
+        ),
+        AIProvider.KIMI.value: partial(
+            OpenAICompatibleAdapter,
+            base_url="https://api.moonshot.cn/v1",
+            default_model="moonshot-v1-8k",
+            provider_name="Kimi"
+        ),
+        AIProvider.GLM.value: partial(
+            OpenAICompatibleAdapter,
+            base_url="https://open.bigmodel.cn/api/paas/v4",
+            default_model="glm-4",
+            provider_name="GLM"
+        ),
+        AIProvider.OPENROUTER.value: partial(
+            OpenAICompatibleAdapter,
+            base_url="https://openrouter.ai/api/v1",
+            default_model="anthropic/claude-3.5-sonnet",
+            provider_name="OpenRouter"
+        ),
     }
     
     @classmethod
-    def create_adapter(cls, provider: AIProvider, api_key: str, model: str = None) -> BaseAIAdapter:
-        """创建AI适配器"""
-        adapter_class = cls._adapters.get(provider)
+    def create_adapter(cls, provider: Union[str, AIProvider], api_key: str, model: str = None) -> BaseAIAdapter:
+        """创建AI适配器（provider 可以是枚举或配置中的字符串）"""
+        key = provider.value if isinstance(provider, AIProvider) else str(provider).lower()
+        adapter_class = cls._adapters.get(key)
         if not adapter_class:
             raise ValueError(f"不支持的AI提供商: {provider}")
         
         return adapter_class(api_key, model)
     
     @classmethod
+    @lru_cache(maxsize=None)
     def get_available_providers(cls) -> List[Dict[str, str]]:
-        """获取可用的AI提供商列表"""
+        """获取可用的AI提供商列表（结果缓存复用，调用方不要修改）"""
         return [
             {"value": AIProvider.CLAUDE.value, "label": "Claude (Anthropic)", "description": "强大的AI助手，适合复杂任务"},
             {"value": AIProvider.OPENAI.value, "label": "OpenAI GPT", "description": "知名的GPT模型系列"},
@@ -344,8 +596,9 @@ class AIAdapterFactory:
         ]
     
     @classmethod
+    @lru_cache(maxsize=None)
     def get_provider_config_examples(cls) -> Dict[str, Dict[str, str]]:
-        """获取提供商配置示例"""
+        """获取提供商配置示例（结果缓存复用，调用方不要修改）"""
         return {
             "claude": {
                 "api_key_example": "sk-ant-REDACTED",
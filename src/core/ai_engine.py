@@ -1,46 +1,92 @@
+import os
+import re
 import json
+import asyncio
+import hashlib
 import logging
-from typing import List, Dict, Optional
-try:
-    from pydantic import BaseModel, Field
-except ImportError:
-    from pydantic.v1 import BaseModel, Field
+import threading
+import time
+from functools import partial
+from typing import AbstractSet, List, Dict, FrozenSet, Optional, Any, Iterator, Tuple
+from msgspec import Struct, to_builtins
 from src.utils.config import config
 from src.core.scanner import FileInfo
-from src.core.ai_adapter import (
-    AIProvider, AIAdapterFactory
-)
+from src.core.ai_adapter import AIAdapterFactory, AIProvider, SYSTEM_PROMPT_ZH
 
 logger = logging.getLogger(__name__)
 
-class FileAction(BaseModel):
+class FileAction(Struct):
     """文件操作模型"""
-    action_type: str = Field(..., description="操作类型 (move)")
-    source: str = Field(..., description="源文件相对路径")
-    destination: str = Field(..., description="目标文件相对路径")
-    reason: str = Field(..., description="操作原因说明")
+    action_type: str  # 操作类型 (move)
+    source: str  # 源文件相对路径
+    destination: str  # 目标文件相对路径
+    reason: str  # 操作原因说明
 
-class AIResponse(BaseModel):
+# FileAction 的必填字段（均为字符串）
+_ACTION_FIELDS = ("action_type", "source", "destination", "reason")
+
+# Struct 构造本身不做类型校验，可直接使用
+_construct_action = FileAction
+
+# 允许的操作类型：第一次检查时从配置读取并缓存（导入模块时不读取配置文件），
+# 配置重新加载时清空，逐个操作检查时不再经过 config 属性
+_allowed_ops: Optional[FrozenSet[str]] = None
+
+def _get_allowed_ops() -> FrozenSet[str]:
+    """允许的操作类型集合"""
+    global _allowed_ops
+    if _allowed_ops is None:
+        _allowed_ops = frozenset(config.allowed_operations)
+    return _allowed_ops
+
+def _refresh_allowed_ops() -> None:
+    """配置重新加载后清空缓存，下次检查时重新读取"""
+    global _allowed_ops
+    _allowed_ops = None
+
+config.add_reload_hook(_refresh_allowed_ops)
+
+# 不安全的目标路径：包含 ".." 路径段，或以 "/"、"~" 开头（绝对路径 / 用户主目录）
+_UNSAFE_RE = re.compile(r'(^|[\\/])\.\.([\\/]|$)|^[\\/~]')
+
+class AIResponse(Struct):
     """AI响应模型"""
-    actions: List[FileAction] = Field(default_factory=list, description="文件操作列表")
+    actions: List[FileAction] = []  # 文件操作列表
     
     def to_dict(self) -> Dict:
         """转换为字典格式"""
-        return {
-            "actions": [
-                {
-                    "action_type": action.action_type,
-                    "source": action.source,
-                    "destination": action.destination,
-                    "reason": action.reason
-                }
-                for action in self.actions
-            ]
-        }
+        return to_builtins(self)
+
+# 适配器缓存：键为 (提供商, API Key 摘要, 模型)，适配器内含HTTP客户端，
+# 多个引擎实例和切换提供商时可直接复用，不必重新建立连接
+_ADAPTER_CACHE: Dict[Tuple[str, str, Optional[str]], Any] = {}
+_ADAPTER_CACHE_SIZE = 8
+_ADAPTER_CACHE_LOCK = threading.Lock()
+
+def _get_adapter(provider: str, api_key: str, model: Optional[str]):
+    """获取（必要时创建）缓存的AI适配器，按最近使用顺序淘汰"""
+    key_hash = hashlib.blake2b((api_key or "").encode(), digest_size=8).hexdigest()
+    cache_key = (str(provider).lower(), key_hash, model)
+    with _ADAPTER_CACHE_LOCK:
+        adapter = _ADAPTER_CACHE.pop(cache_key, None)
+        if adapter is None:
+            adapter = AIAdapterFactory.create_adapter(provider, api_key, model)
+        # 重新插入到末尾，字典顺序即最近使用顺序
+        _ADAPTER_CACHE[cache_key] = adapter
+        while len(_ADAPTER_CACHE) > _ADAPTER_CACHE_SIZE:
+            del _ADAPTER_CACHE[next(iter(_ADAPTER_CACHE))]
+    return adapter
 
 class MultiAIEngine:
     """多AI提供商统一引擎"""
     
+    # 批量生成时每次请求合并的最大任务数
+    BATCH_SIZE = 25
+    # 多提供商并发请求时同时在途的最大请求数
+    MAX_CONCURRENT_REQUESTS = 5
+    # 连接测试的超时时间（秒）
+    PING_TIMEOUT = 10
+    
     def __init__(self, provider: str = None):
         self.provider = provider or config.ai_provider
         self.adapter = None
@@ -62,24 +108,24 @@ class MultiAIEngine:
         
         try:
             # 创建适配器
-            ai_provider = AIProvider(self.provider)
-            self.adapter = AIAdapterFactory.create_adapter(ai_provider, api_key, model)
+            self.adapter = _get_adapter(self.provider, api_key, model)
             logger.info(f"AI适配器初始化成功: {self.provider}")
             
         except Exception as e:
             logger.error(f"AI适配器初始化失败: {e}")
             raise
     
+    @classmethod
+    def list_providers(cls) -> List[str]:
+        """获取已启用且配置了API Key的提供商列表，直接读取配置，无需创建引擎"""
+        return [
+            provider for provider, config_data in config._config.get('ai_providers', {}).items()
+            if config_data.get('enabled', False) and config_data.get('api_key')
+        ]
+    
     def get_available_providers(self) -> List[str]:
         """获取可用的AI提供商列表"""
-        available = []
-        providers = config._config.get('ai_providers', {})
-        
-        for provider, config_data in providers.items():
-            if config_data.get('enabled', False) and config_data.get('api_key'):
-                available.append(provider)
-        
-        return available
+        return self.list_providers()
     
     def switch_provider(self, provider: str) -> bool:
         """切换AI提供商"""
@@ -104,79 +150,43 @@ class MultiAIEngine:
     
     def _build_system_prompt(self) -> str:
         """构建系统提示词"""
-        return """你是 FreeU 文件整理助手，负责根据用户指令生成文件整理方案。
-
-【角色定义】
-- 只处理本地文件整理任务
-- 输出必须是严格的 JSON 格式
-- 只允许执行移动操作（move），不支持删除操作
-- 目标路径必须在用户指定的目录下
-
-【输出格式】
-{
-  "actions": [
-    {
-      "action_type": "move",
-      "source": "相对路径",
-      "destination": "目标相对路径", 
-      "reason": "简短说明"
-    }
-  ]
-}
-
-【操作规则】
-1. 只移动文件，不移动目录
-2. 目标路径使用相对路径，相对于用户指定的基础目录
-3. 自动创建必要的子目录
-4. 不要移动隐藏文件（以.开头）
-5. 不要移动系统文件
-
-【分类建议】
-- 图片文件：jpg, jpeg, png, gif, bmp, svg, webp → Pictures/
-- 文档文件：pdf, doc, docx, txt, rtf → Documents/
-- 视频文件：mp4, avi, mov, mkv, wmv → Videos/
-- 音频文件：mp3, wav, flac, aac, m4a → Music/
-- 压缩文件：zip, rar, 7z, tar, gz → Archives/
-- 表格文件：xls, xlsx, csv → Spreadsheets/
-- 演示文件：ppt, pptx → Presentations/
-
-【示例】
-用户指令："把所有图片放到 Pictures 文件夹"
-文件列表：["photo.jpg", "document.pdf", "screenshot.png"]
-输出：
-{
-  "actions": [
-    {"action_type": "move", "source": "photo.jpg", "destination": "Pictures/photo.jpg", "reason": "图片文件"},
-    {"action_type": "move", "source": "screenshot.png", "destination": "Pictures/screenshot.png", "reason": "图片文件"}
-  ]
-}"""
+        return SYSTEM_PROMPT_ZH
     
     def _build_user_prompt(self, user_instruction: str, files: List[FileInfo]) -> str:
-        """构建用户提示词"""
-        # 构建文件列表字符串
-        file_list = []
-        for file in files:
-            file_info = f"- {file.name} (大小: {self._format_file_size(file.size)}, 修改时间: {file.modified_time.strftime('%Y-%m-%d %H:%M:%S')})"
-            file_list.append(file_info)
-        
-        files_str = "\n".join(file_list)
-        
-        return f"""用户指令：{user_instruction}
-
-当前目录下的文件：
-{files_str}
-
-请根据用户指令生成文件整理方案。只返回 JSON 格式，不要包含其他解释。"""
+        """构建用户提示词（与适配器实际发送的内容一致）"""
+        return self.adapter._build_user_prompt(user_instruction, files)
+    
+    async def aping(self) -> float:
+        """验证当前提供商的连接（不生成整理方案），返回耗时（毫秒）；失败时抛出异常"""
+        if not self.adapter:
+            raise ValueError("AI适配器未初始化")
+        return await self._timed_ping(self.adapter)
+    
+    @classmethod
+    async def aping_provider(cls, provider: str) -> float:
+        """用指定提供商自己的配置验证连接，无需创建引擎；返回耗时（毫秒），失败时抛出异常"""
+        provider_config = config.get_ai_provider_config(provider)
+        if not provider_config.get('api_key'):
+            raise ValueError(f"提供商 {provider} 未配置API Key")
+        adapter = _get_adapter(provider, provider_config['api_key'], provider_config.get('model'))
+        return await cls._timed_ping(adapter)
     
-    def _format_file_size(self, size: int) -> str:
-        """格式化文件大小"""
-        for unit in ['B', 'KB', 'MB', 'GB']:
-            if size < 1024.0:
-                return f"{size:.1f} {unit}"
-            size /= 1024.0
-        return f"{size:.1f} TB"
+    @classmethod
+    async def _timed_ping(cls, adapter) -> float:
+        """调用适配器的 aping 并返回耗时（毫秒），超过 PING_TIMEOUT 秒视为失败"""
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(adapter.aping(), timeout=cls.PING_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"连接超时（{cls.PING_TIMEOUT} 秒内没有响应）") from None
+        return (time.perf_counter() - start) * 1000
+    
+    def ping(self) -> float:
+        """aping 的同步版本"""
+        return asyncio.run(self.aping())
     
-    def generate_organization_plan(self, user_instruction: str, files: List[FileInfo]) -> AIResponse:
+    def generate_organization_plan(self, user_instruction: str, files: List[FileInfo], full_list: Optional[bool] = None,
+                                   classify_locally: Optional[bool] = None) -> AIResponse:
         """生成文件整理方案"""
         logger.info(f"开始生成整理方案，用户指令: {user_instruction}, 文件数量: {len(files)}, 提供商: {self.provider}")
         
@@ -188,36 +198,238 @@ class MultiAIEngine:
             return AIResponse(actions=[])
         
         try:
-            # 使用适配器生成方案
-            result_data = self.adapter.generate_organization_plan(user_instruction, files)
-            
-            # 解析操作列表
-            actions = []
-            for action_data in result_data.get("actions", []):
-                try:
-                    action = FileAction(**action_data)
-                    # 验证操作类型
-                    if action.action_type not in config.allowed_operations:
-                        logger.warning(f"跳过不允许的操作类型: {action.action_type}")
-                        continue
-                    actions.append(action)
-                except Exception as e:
-                    logger.error(f"解析操作失败: {action_data} - {e}")
-                    continue
+            local_actions, files_for_ai = self._classify_locally(files, classify_locally)
+            result_data = {"actions": local_actions}
+            if self._needs_ai(files_for_ai):
+                # 使用适配器生成方案
+                ai_data = self.adapter.generate_organization_plan(user_instruction, files_for_ai, full_list)
+                result_data["actions"] = local_actions + ai_data.get("actions", [])
+            return self._parse_response(result_data, files)
             
-            result = AIResponse(actions=actions)
-            logger.info(f"生成整理方案完成，操作数量: {len(actions)}")
-            return result
+        except Exception as e:
+            logger.error(f"生成整理方案失败: {e}")
+            raise
+    
+    async def agenerate_organization_plan(self, user_instruction: str, files: List[FileInfo], full_list: Optional[bool] = None,
+                                          classify_locally: Optional[bool] = None) -> AIResponse:
+        """异步生成文件整理方案，可通过 asyncio.gather 并发发起多个请求"""
+        logger.info(f"开始异步生成整理方案，用户指令: {user_instruction}, 文件数量: {len(files)}, 提供商: {self.provider}")
+        
+        if not self.adapter:
+            raise ValueError("AI适配器未初始化")
+        
+        if not files:
+            logger.warning("文件列表为空")
+            return AIResponse(actions=[])
+        
+        try:
+            local_actions, files_for_ai = self._classify_locally(files, classify_locally)
+            result_data = {"actions": local_actions}
+            if self._needs_ai(files_for_ai):
+                ai_data = await self.adapter.agenerate_organization_plan(user_instruction, files_for_ai, full_list)
+                result_data["actions"] = local_actions + ai_data.get("actions", [])
+            return self._parse_response(result_data, files)
             
         except Exception as e:
             logger.error(f"生成整理方案失败: {e}")
             raise
     
-    def validate_actions(self, actions: List[FileAction], available_files: List[FileInfo]) -> List[Dict]:
-        """验证操作的有效性"""
+    async def agenerate_with_fallback(self, user_instruction: str, files: List[FileInfo], providers: List[str],
+                                      full_list: Optional[bool] = None) -> AIResponse:
+        """同时向多个提供商请求整理方案，采用最先成功返回的结果并取消其余请求
+        
+        总耗时取决于最快的提供商而不是各提供商之和；未配置API Key的提供商会被跳过。
+        """
+        logger.info(f"开始多提供商并发生成整理方案，用户指令: {user_instruction}, 文件数量: {len(files)}, 提供商: {providers}")
+        
+        if not files:
+            logger.warning("文件列表为空")
+            return AIResponse(actions=[])
+        
+        adapters = []
+        for provider in providers:
+            provider_config = config.get_ai_provider_config(provider)
+            if not provider_config.get('api_key'):
+                logger.warning(f"提供商 {provider} 未配置API Key，跳过")
+                continue
+            adapters.append(_get_adapter(provider, provider_config['api_key'], provider_config.get('model')))
+        
+        if not adapters:
+            raise ValueError("没有可用的AI提供商，请在设置中配置API Key")
+        
+        semaphore = asyncio.Semaphore(self.MAX_CONCURRENT_REQUESTS)
+        
+        async def request(adapter):
+            async with semaphore:
+                return await adapter.agenerate_organization_plan(user_instruction, files, full_list)
+        
+        pending = {asyncio.ensure_future(request(adapter)) for adapter in adapters}
+        last_error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return self._parse_response(task.result(), files)
+                    last_error = task.exception()
+                    logger.warning(f"提供商请求失败，等待其他提供商: {last_error}")
+        finally:
+            # 已有结果或全部失败后，取消仍在进行的请求
+            for task in pending:
+                task.cancel()
+        
+        logger.error(f"所有提供商均生成失败: {last_error}")
+        raise last_error
+    
+    def generate_with_fallback(self, user_instruction: str, files: List[FileInfo], providers: List[str],
+                               full_list: Optional[bool] = None) -> AIResponse:
+        """agenerate_with_fallback 的同步版本"""
+        return asyncio.run(self.agenerate_with_fallback(user_instruction, files, providers, full_list))
+    
+    def generate_organization_plans_batch(self, requests: List[Tuple[str, List[FileInfo]]],
+                                          full_list: Optional[bool] = None) -> List[AIResponse]:
+        """把多个 (指令, 文件列表) 合并到尽量少的请求中，按输入顺序返回各自的方案
+        
+        每个请求最多合并 BATCH_SIZE 个任务，既分摊系统提示词开销，又避免单次输出过长。
+        """
+        logger.info(f"开始批量生成整理方案，任务数量: {len(requests)}, 提供商: {self.provider}")
+        
+        if not self.adapter:
+            raise ValueError("AI适配器未初始化")
+        
+        responses = []
+        for start in range(0, len(requests), self.BATCH_SIZE):
+            batch = requests[start:start + self.BATCH_SIZE]
+            try:
+                result_data = self.adapter.generate_batch_plans(batch, full_list)
+            except Exception as e:
+                logger.error(f"批量生成整理方案失败: {e}")
+                raise
+            
+            actions_by_task = {
+                item.get("task_id"): item.get("actions", [])
+                for item in result_data.get("results", [])
+            }
+            for task_id, (_, files) in enumerate(batch, 1):
+                if task_id not in actions_by_task:
+                    logger.warning(f"批量结果中缺少任务 {start + task_id}")
+                responses.append(self._parse_response({"actions": actions_by_task.get(task_id, [])}, files))
+        
+        return responses
+    
+    def iter_organization_plan(self, user_instruction: str, files: List[FileInfo], full_list: Optional[bool] = None) -> Iterator[FileAction]:
+        """流式生成整理方案，模型每输出一个操作就立即产出，调用方可提前处理或中断"""
+        logger.info(f"开始流式生成整理方案，用户指令: {user_instruction}, 文件数量: {len(files)}, 提供商: {self.provider}")
+        
+        if not self.adapter:
+            raise ValueError("AI适配器未初始化")
+        
+        if not files:
+            logger.warning("文件列表为空")
+            return
+        
+        for action_data in self.adapter.stream_organization_plan(user_instruction, files, full_list):
+            yield from self._parse_action(action_data, files)
+    
+    def _classify_locally(self, files: List[FileInfo], enabled: Optional[bool] = None) -> tuple:
+        """按扩展名本地分类，只把无法确定的文件交给AI
+        
+        enabled 为 None 时读取配置项 local_classification；未启用时所有文件都交给AI。
+        """
+        if enabled is None:
+            enabled = config.local_classification
+        if not enabled:
+            return [], files
+        
+        local_actions, unresolved = self.adapter.classify_fast(files)
+        logger.info(f"本地按扩展名分类 {len(local_actions)} 个文件，剩余 {len(unresolved)} 个交给AI")
+        return local_actions, unresolved
+    
+    def _needs_ai(self, files: List[FileInfo]) -> bool:
+        """是否还有需要AI判断的文件（只剩目录时无需调用AI）"""
+        return any(not file.is_directory for file in files)
+    
+    @classmethod
+    def _parse_response(cls, result_data: Dict, files: List[FileInfo]) -> AIResponse:
+        """解析适配器返回的操作列表"""
+        actions = []
+        seen = set()
+        for action_data in result_data.get("actions", []):
+            for action in cls._parse_action(action_data, files):
+                # 模型可能重复输出同一个移动操作，只保留第一次出现的
+                key = (action.source, action.destination)
+                if key in seen:
+                    logger.debug(f"跳过重复操作: {action.source} → {action.destination}")
+                    continue
+                seen.add(key)
+                actions.append(action)
+        
+        result = AIResponse(actions=actions)
+        logger.info(f"生成整理方案完成，操作数量: {len(actions)}")
+        return result
+    
+    @classmethod
+    def _parse_action(cls, action_data: Dict, files: List[FileInfo]) -> List[FileAction]:
+        """解析单个操作，非法操作返回空列表"""
+        # 只做必要字段的类型检查，然后直接构造
+        if not isinstance(action_data, dict) or not all(
+            isinstance(action_data.get(key), str) for key in _ACTION_FIELDS
+        ):
+            logger.error(f"解析操作失败: {action_data} - 缺少必要字段")
+            return []
+        action = _construct_action(**{key: action_data[key] for key in _ACTION_FIELDS})
+        
+        # 验证操作类型
+        if action.action_type not in _get_allowed_ops():
+            logger.warning(f"跳过不允许的操作类型: {action.action_type}")
+            return []
+        
+        if action.source.startswith("*."):
+            # 汇总模式下的扩展名规则，展开到每个匹配的文件
+            return cls._expand_pattern_action(action, files)
+        
+        return [action]
+    
+    @staticmethod
+    def _expand_pattern_action(action: FileAction, files: List[FileInfo]) -> List[FileAction]:
+        """把 "*.ext" → "Folder/" 形式的规则展开为逐个文件的操作
+        
+        "*." 匹配没有扩展名的文件。目标保留文件在扫描目录中的相对路径（a/b.jpg → Folder/a/b.jpg），
+        不把子目录里的文件压平到同一层，避免同名文件被迫改名；已经位于目标文件夹下的文件跳过。
+        """
+        ext = action.source[1:].lower()
+        if ext == ".":
+            ext = ""
+        prefix = action.destination.rstrip("/") + "/"
+        expanded = [
+            FileAction(
+                action_type=action.action_type,
+                source=file.path,
+                destination=prefix + file.path,
+                reason=action.reason
+            )
+            for file in files
+            if not file.is_directory and file.extension.lower() == ext and not file.path.startswith(prefix)
+        ]
+        logger.debug(f"展开规则 {action.source} → {action.destination}: {len(expanded)} 个文件")
+        return expanded
+    
+    @staticmethod
+    def build_file_name_index(files: List[FileInfo]) -> FrozenSet[str]:
+        """文件名集合，供 validate_actions 判断源文件是否存在；同一次扫描的结果只需构建一次"""
+        return frozenset(file.name for file in files)
+    
+    def validate_actions(self, actions: List[FileAction], available_files: List[FileInfo],
+                         file_names: Optional[AbstractSet[str]] = None) -> List[Dict]:
+        """验证操作的有效性
+        
+        file_names 为 build_file_name_index(available_files) 的结果，未传入时现场构建。
+        """
         logger.info(f"开始验证操作，操作数量: {len(actions)}")
         
-        available_file_names = {file.name: file for file in available_files}
+        # 只需判断成员关系，用集合即可
+        available_file_names = file_names if file_names is not None else self.build_file_name_index(available_files)
+        allowed_ops = _get_allowed_ops()
         validation_results = []
         
         for i, action in enumerate(actions):
@@ -230,20 +442,20 @@ class MultiAIEngine:
             }
             
             # 检查源文件是否存在
-            source_filename = Path(action.source).name
+            source_filename = os.path.basename(action.source)
             if source_filename not in available_file_names:
                 result["valid"] = False
                 result["message"] = f"源文件不存在: {action.source}"
                 logger.warning(f"操作验证失败 - 源文件不存在: {action.source}")
             
             # 检查路径安全性
-            if ".." in action.destination:
+            if _UNSAFE_RE.search(action.destination):
                 result["valid"] = False
                 result["message"] = f"目标路径不安全: {action.destination}"
                 logger.warning(f"操作验证失败 - 路径不安全: {action.destination}")
             
             # 检查操作类型
-            if action.action_type not in config.allowed_operations:
+            if action.action_type not in allowed_ops:
                 result["valid"] = False
                 result["message"] = f"不允许的操作类型: {action.action_type}"
                 logger.warning(f"操作验证失败 - 不允许的操作: {action.action_type}")
@@ -256,4 +468,7 @@ class MultiAIEngine:
         valid_count = sum(1 for r in validation_results if r["valid"])
         logger.info(f"操作验证完成，有效操作: {valid_count}/{len(actions)}")
         
-        return validation_results
\ No newline at end of file
+        return validation_results
+
+# 向后兼容：旧版单独的 ClaudeAI 引擎已合并到 MultiAIEngine
+ClaudeAI = partial(MultiAIEngine, provider=AIProvider.CLAUDE.value)
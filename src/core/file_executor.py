@@ -1,185 +1,306 @@
 import os
+import stat
+import errno
 import shutil
 import logging
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import List, Dict, Optional
-try:
-    from pydantic import BaseModel, Field
-except ImportError:
-    from pydantic.v1 import BaseModel, Field
+from typing import List, Dict, Iterable, Iterator, Optional, Set, Tuple, Union
+from msgspec import Struct
 from src.core.ai_engine import FileAction
 from src.core.scanner import FileInfo
 from src.utils.config import config
+from src.utils.logger import log_progress
 
 logger = logging.getLogger(__name__)
 
-class FileExecutionResult(BaseModel):
+class FileExecutionResult(Struct):
     """文件操作执行结果"""
-    success: bool = Field(..., description="是否成功")
-    source: str = Field(..., description="源文件路径")
-    destination: str = Field(..., description="目标文件路径")
-    action_type: str = Field(..., description="操作类型")
-    error: Optional[str] = Field(None, description="错误信息")
-    warning: Optional[str] = Field(None, description="警告信息")
+    success: bool  # 是否成功
+    source: str  # 源文件路径
+    destination: str  # 目标文件路径
+    action_type: str  # 操作类型
+    error: Optional[str] = None  # 错误信息
+    warning: Optional[str] = None  # 警告信息
 
 class FileExecutor:
     """文件操作执行器"""
     
+    # 并发移动文件的最大线程数（移动以 I/O 为主，按 CPU 核数的 4 倍估算）
+    MAX_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+    
     def __init__(self, base_path: Path):
         self.base_path = base_path.resolve()
+        # 基础目录与排除目录在构造时解析一次，统一以分隔符结尾，逐个路径只需做前缀比较
+        self._base_str = os.path.join(str(self.base_path), "")
+        self._excluded_resolved = config.resolved_excluded_paths
         logger.info(f"初始化文件执行器，基础路径: {self.base_path}")
     
     def execute_actions(self, actions: List[FileAction], available_files: List[FileInfo]) -> List[Dict]:
         """执行文件操作"""
+        results: List[Optional[Dict]] = [None] * len(actions)
+        for i, result in self.iter_execute_actions(actions, available_files):
+            results[i] = result
+        return results
+    
+    def iter_execute_actions(self, actions: List[FileAction], available_files: List[FileInfo]) -> Iterator[Tuple[int, Dict]]:
+        """执行文件操作，每得到一个结果就产出 (操作下标, 执行结果)
+        
+        未通过校验的操作最先产出，其余按移动完成的顺序产出，调用方可以边执行边显示进度。
+        调用方提前结束遍历时，已提交的移动仍会完成，但不再产出结果。
+        """
         logger.info(f"开始执行文件操作，操作数量: {len(actions)}")
         
-        results = []
-        success_count = 0
+        results: List[Optional[Dict]] = [None] * len(actions)
+        pending = {}
         
+        # 校验在主线程顺序完成；目标文件名在移动时以 O_EXCL 原子占用，并发移动不会互相覆盖
         for i, action in enumerate(actions):
-            logger.info(f"执行操作 {i+1}/{len(actions)}: {action.source} → {action.destination}")
-            
             try:
-                result = self._execute_single_action(action, available_files)
-                results.append(result)
-                
-                if result["success"]:
-                    success_count += 1
-                    logger.info(f"操作成功: {action.source} → {action.destination}")
-                else:
-                    logger.warning(f"操作失败: {action.source} - {result['error']}")
-                
-                # 记录进度
-                log_progress(i + 1, len(actions), f"文件操作进度")
-                
+                prepared = self._prepare_action(action)
             except Exception as e:
                 logger.error(f"执行操作异常: {action.source} - {e}")
-                results.append({
-                    "success": False,
-                    "source": action.source,
-                    "destination": action.destination,
-                    "action_type": action.action_type,
-                    "error": f"执行异常: {str(e)}"
-                })
+                prepared = self._failure(action, f"执行异常: {str(e)}")
+            
+            if isinstance(prepared, dict):
+                results[i] = prepared
+                yield i, prepared
+            else:
+                pending[i] = prepared
+        
+        # 所有目标目录去重后统一创建，同一目录只 mkdir 一次
+        dir_errors = self._create_directories({prepared[1].parent for prepared in pending.values()})
+        if dir_errors:
+            for i in list(pending):
+                error = dir_errors.get(pending[i][1].parent)
+                if error is not None:
+                    results[i] = self._failure(actions[i], f"创建目标目录失败: {error}")
+                    del pending[i]
+                    yield i, results[i]
+        
+        # 通过校验的移动操作相互独立，交给线程池并发执行
+        if pending:
+            completed = 0
+            dir_fd = self._open_base_dir()
+            try:
+                with ThreadPoolExecutor(max_workers=min(self.MAX_WORKERS, len(pending))) as pool:
+                    futures = {
+                        pool.submit(self._move_file, actions[i], *pending[i], dir_fd=dir_fd): i
+                        for i in pending
+                    }
+                    for future in as_completed(futures):
+                        i = futures[future]
+                        results[i] = future.result()
+                        completed += 1
+                        # 记录进度
+                        log_progress(completed, len(pending), "文件操作进度")
+                        yield i, results[i]
+            finally:
+                if dir_fd is not None:
+                    os.close(dir_fd)
+        
+        self._log_results(actions, results)
+    
+    def execute_streaming(self, actions: Iterable[FileAction]) -> Tuple[List[FileAction], List[Dict]]:
+        """边接收边执行文件操作
+        
+        actions 可以是 MultiAIEngine.iter_organization_plan 这样的流式生成器：
+        每收到一个操作就校验并提交给线程池，文件移动与模型继续生成的过程重叠进行。
+        返回 (收到的操作列表, 对应的执行结果列表)。
+        """
+        logger.info("开始流式执行文件操作")
+        
+        received: List[FileAction] = []
+        slots: List[Union[Dict, Future]] = []
+        dir_errors: Dict[Path, Optional[str]] = {}
+        dir_fd = self._open_base_dir()
+        try:
+            with ThreadPoolExecutor(max_workers=self.MAX_WORKERS) as pool:
+                for action in actions:
+                    received.append(action)
+                    try:
+                        prepared = self._prepare_action(action)
+                    except Exception as e:
+                        logger.error(f"执行操作异常: {action.source} - {e}")
+                        prepared = self._failure(action, f"执行异常: {str(e)}")
+                    
+                    if isinstance(prepared, dict):
+                        slots.append(prepared)
+                        continue
+                    
+                    # 流式场景无法预先汇总目录，按首次出现创建并记住结果
+                    destination_dir = prepared[1].parent
+                    if destination_dir not in dir_errors:
+                        dir_errors[destination_dir] = self._create_directories({destination_dir}).get(destination_dir)
+                    if dir_errors[destination_dir] is not None:
+                        slots.append(self._failure(action, f"创建目标目录失败: {dir_errors[destination_dir]}"))
+                        continue
+                    
+                    slots.append(pool.submit(self._move_file, action, *prepared, dir_fd=dir_fd))
+                
+                results = [slot.result() if isinstance(slot, Future) else slot for slot in slots]
+        finally:
+            if dir_fd is not None:
+                os.close(dir_fd)
+        
+        self._log_results(received, results)
+        return received, results
+    
+    def _log_results(self, actions: List[FileAction], results: List[Dict]) -> None:
+        """逐条记录执行结果并汇总"""
+        success_count = 0
+        for i, (action, result) in enumerate(zip(actions, results)):
+            if result["success"]:
+                success_count += 1
+                logger.info(f"操作 {i+1}/{len(actions)} 成功: {action.source} → {result['destination']}")
+            else:
+                logger.warning(f"操作 {i+1}/{len(actions)} 失败: {action.source} - {result['error']}")
         
         logger.info(f"文件操作执行完成，成功: {success_count}/{len(actions)}")
-        return results
     
     def _execute_single_action(self, action: FileAction, available_files: List[FileInfo]) -> Dict:
         """执行单个文件操作"""
         try:
-            # 验证操作类型
-            if action.action_type != "move":
-                return {
-                    "success": False,
-                    "source": action.source,
-                    "destination": action.destination,
-                    "action_type": action.action_type,
-                    "error": f"不支持的操作类型: {action.action_type}"
-                }
-            
-            # 构建完整路径
-            source_path = self.base_path / action.source
-            destination_path = self.base_path / action.destination
-            
-            # 验证源文件存在
-            if not source_path.exists():
-                return {
-                    "success": False,
-                    "source": action.source,
-                    "destination": action.destination,
-                    "action_type": action.action_type,
-                    "error": "源文件不存在"
-                }
-            
-            if not source_path.is_file():
-                return {
-                    "success": False,
-                    "source": action.source,
-                    "destination": action.destination,
-                    "action_type": action.action_type,
-                    "error": "源路径不是文件"
-                }
-            
-            # 检查目标路径安全性
-            if not self._is_path_safe(destination_path):
-                return {
-                    "success": False,
-                    "source": action.source,
-                    "destination": action.destination,
-                    "action_type": action.action_type,
-                    "error": "目标路径不安全"
-                }
-            
-            # 创建目标目录
-            destination_dir = destination_path.parent
-            try:
-                destination_dir.mkdir(parents=True, exist_ok=True)
-            except Exception as e:
-                return {
-                    "success": False,
-                    "source": action.source,
-                    "destination": action.destination,
-                    "action_type": action.action_type,
-                    "error": f"创建目标目录失败: {str(e)}"
-                }
-            
-            # 检查目标文件是否已存在
-            if destination_path.exists():
-                # 生成新的文件名
-                destination_path = self._generate_unique_filename(destination_path)
-                warning = f"目标文件已存在，重命名为: {destination_path.name}"
-                logger.warning(warning)
-            
-            # 执行移动操作
+            prepared = self._prepare_action(action)
+            if isinstance(prepared, dict):
+                return prepared
+            destination_dir = prepared[1].parent
+            error = self._create_directories({destination_dir}).get(destination_dir)
+            if error is not None:
+                return self._failure(action, f"创建目标目录失败: {error}")
+            return self._move_file(action, *prepared)
+        except Exception as e:
+            logger.error(f"执行操作异常: {action.source} - {e}")
+            return self._failure(action, f"操作异常: {str(e)}")
+    
+    def _prepare_action(self, action: FileAction) -> Union[Dict, Tuple[Path, Path]]:
+        """校验操作并构建完整路径
+        
+        校验失败时返回失败结果；成功时返回 (源路径, 目标路径)。
+        目标目录不在此创建，由调用方去重后统一创建。
+        """
+        # 验证操作类型
+        if action.action_type != "move":
+            return self._failure(action, f"不支持的操作类型: {action.action_type}")
+        
+        # 构建完整路径
+        source_path = self.base_path / action.source
+        destination_path = self.base_path / action.destination
+        
+        # 验证源文件存在且是普通文件（一次 stat 同时完成两项检查）
+        try:
+            source_stat = os.stat(source_path)
+        except (FileNotFoundError, NotADirectoryError):
+            return self._failure(action, "源文件不存在")
+        
+        if not stat.S_ISREG(source_stat.st_mode):
+            return self._failure(action, "源路径不是文件")
+        
+        # 检查目标路径安全性
+        if not self._is_path_safe(destination_path):
+            return self._failure(action, "目标路径不安全")
+        
+        return source_path, destination_path
+    
+    def _create_directories(self, directories: Set[Path]) -> Dict[Path, str]:
+        """批量创建目标目录，返回创建失败的目录及错误信息"""
+        errors = {}
+        for directory in sorted(directories):
             try:
-                shutil.move(str(source_path), str(destination_path))
-                
-                return {
-                    "success": True,
-                    "source": action.source,
-                    "destination": str(destination_path.relative_to(self.base_path)),
-                    "action_type": action.action_type,
-                    "error": None,
-                    "warning": warning if destination_path.name != Path(action.destination).name else None
-                }
-                
+                directory.mkdir(parents=True, exist_ok=True)
             except Exception as e:
-                return {
-                    "success": False,
-                    "source": action.source,
-                    "destination": action.destination,
-                    "action_type": action.action_type,
-                    "error": f"移动文件失败: {str(e)}"
-                }
-                
+                logger.error(f"创建目标目录失败: {directory} - {e}")
+                errors[directory] = str(e)
+        return errors
+    
+    def _open_base_dir(self) -> Optional[int]:
+        """打开基础目录的文件描述符，供批量 renameat 使用；平台不支持时返回 None"""
+        if os.rename not in os.supports_dir_fd:
+            return None
+        try:
+            return os.open(self.base_path, os.O_RDONLY | getattr(os, "O_DIRECTORY", 0))
+        except OSError as e:
+            logger.debug(f"无法打开基础目录描述符，回退到路径移动: {e}")
+            return None
+    
+    def _move_file(self, action: FileAction, source_path: Path, destination_path: Path,
+                   dir_fd: Optional[int] = None) -> Dict:
+        """执行移动操作（可在工作线程中调用）
+        
+        先以 O_EXCL 占用目标文件名（已存在则改用带序号的新名字），再把源文件替换到占位文件上。
+        提供 dir_fd 时，同一文件系统内的移动直接以相对路径调用 renameat，
+        内核无需从根目录逐级解析路径；否则用 os.replace 原子重命名。
+        只有跨设备（EXDEV）时才回退到 shutil.move 的复制+删除。
+        """
+        try:
+            claimed_path = self._claim_unique_path(destination_path)
         except Exception as e:
-            logger.error(f"执行操作异常: {action.source} - {e}")
+            return self._failure(action, f"移动文件失败: {str(e)}")
+        
+        warning = None
+        if claimed_path != destination_path:
+            warning = f"目标文件已存在，重命名为: {claimed_path.name}"
+            logger.warning(warning)
+        destination_path = claimed_path
+        
+        try:
+            try:
+                if dir_fd is not None:
+                    os.rename(
+                        os.path.relpath(source_path, self.base_path),
+                        os.path.relpath(destination_path, self.base_path),
+                        src_dir_fd=dir_fd,
+                        dst_dir_fd=dir_fd
+                    )
+                else:
+                    os.replace(source_path, destination_path)
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    raise
+                shutil.move(os.fspath(source_path), os.fspath(destination_path))
+            
             return {
-                "success": False,
+                "success": True,
                 "source": action.source,
-                "destination": action.destination,
+                "destination": str(destination_path.relative_to(self.base_path)),
                 "action_type": action.action_type,
-                "error": f"操作异常: {str(e)}"
+                "error": None,
+                "warning": warning
             }
+            
+        except Exception as e:
+            # 移动失败时删除占位文件
+            try:
+                os.unlink(destination_path)
+            except OSError:
+                pass
+            return self._failure(action, f"移动文件失败: {str(e)}")
+    
+    def _failure(self, action: FileAction, error: str) -> Dict:
+        """构建失败结果"""
+        return {
+            "success": False,
+            "source": action.source,
+            "destination": action.destination,
+            "action_type": action.action_type,
+            "error": error
+        }
     
     def _is_path_safe(self, path: Path) -> bool:
         """检查路径是否安全"""
         try:
-            # 解析路径
-            resolved_path = path.resolve()
+            # 解析路径（末尾补分隔符，避免 /a/bc 误匹配 /a/b）
+            resolved_str = os.path.join(str(path.resolve()), "")
             
             # 检查是否在基础路径下
-            if not str(resolved_path).startswith(str(self.base_path)):
+            if not resolved_str.startswith(self._base_str):
                 logger.warning(f"路径不在基础目录下: {path}")
                 return False
             
             # 检查是否在排除路径列表中
-            for excluded_path in config.excluded_paths:
-                excluded = Path(excluded_path).expanduser().resolve()
-                if str(resolved_path).startswith(str(excluded)):
-                    logger.warning(f"路径在排除列表中: {path}")
-                    return False
+            if resolved_str.startswith(self._excluded_resolved):
+                logger.warning(f"路径在排除列表中: {path}")
+                return False
             
             return True
             
@@ -187,29 +308,24 @@ class FileExecutor:
             logger.error(f"路径安全检查失败: {path} - {e}")
             return False
     
-    def _generate_unique_filename(self, path: Path) -> Path:
-        """生成唯一的文件名"""
-        if not path.exists():
-            return path
+    def _claim_unique_path(self, path: Path) -> Path:
+        """原子地占用一个不存在的目标路径（创建空占位文件），返回实际占用的路径
         
-        stem = path.stem
-        suffix = path.suffix
-        parent = path.parent
+        O_CREAT|O_EXCL 保证检查和创建是同一个系统调用，多个线程或进程同时移动时不会选中同一个名字。
+        """
+        candidate = path
+        for counter in range(1000):
+            if counter:
+                candidate = path.with_name(f"{path.stem}_{counter}{path.suffix}")
+            try:
+                fd = os.open(candidate, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o600)
+            except FileExistsError:
+                continue
+            os.close(fd)
+            return candidate
         
-        counter = 1
-        while True:
-            new_name = f"{stem}_{counter}{suffix}"
-            new_path = parent / new_name
-            
-            if not new_path.exists():
-                return new_path
-            
-            counter += 1
-            
-            # 防止无限循环
-            if counter > 999:
-                logger.error(f"无法生成唯一文件名: {path}")
-                raise ValueError(f"无法生成唯一文件名: {path}")
+        logger.error(f"无法生成唯一文件名: {path}")
+        raise ValueError(f"无法生成唯一文件名: {path}")
     
     def undo_last_operation(self) -> bool:
         """撤销最后一次操作（TODO: 未来实现）"""
@@ -1,58 +1,131 @@
 import os
+import stat
 import logging
+import sqlite3
+import threading
+import time
+from collections import Counter, deque
+from contextlib import closing
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from operator import attrgetter
 from pathlib import Path
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import List, Dict, Iterable, Iterator, NamedTuple, Optional, Tuple
+import msgspec
+from src.utils.config import config
 try:
-    from pydantic import BaseModel, Field
+    import numpy as np
 except ImportError:
-    from pydantic.v1 import BaseModel, Field
-from src.utils.config import config
+    np = None
+from src.core import _statx
 
 logger = logging.getLogger(__name__)
 
-class FileInfo(BaseModel):
-    """文件信息模型"""
-    name: str = Field(..., description="文件名")
-    path: str = Field(..., description="相对路径")
-    extension: str = Field(..., description="文件扩展名")
-    size: int = Field(..., description="文件大小（字节）")
-    modified_time: datetime = Field(..., description="修改时间")
-    is_directory: bool = Field(False, description="是否为目录")
+# 按名称排序目录项
+_entry_name = attrgetter('name')
+
+# 原始扩展名 → 小写扩展名；目录中的扩展名种类很少，缓存后绝大多数文件无需重新 lower()
+_EXT_CACHE: Dict[str, str] = {}
+
+def _lower_extension(name: str) -> str:
+    """取文件名的小写扩展名（含点号），无扩展名或隐藏文件名返回空字符串"""
+    dot = name.rfind('.')
+    if dot <= 0:
+        return ""
+    ext = name[dot:]
+    ext_lower = _EXT_CACHE.get(ext)
+    if ext_lower is None:
+        ext_lower = _EXT_CACHE[ext] = ext.lower()
+    return ext_lower
+
+class FileInfo(msgspec.Struct, frozen=True, gc=False):
+    """文件信息模型
+    
+    扫描时每个条目都要创建一个实例。msgspec.Struct 使用 __slots__ 和 C 实现的 __init__，
+    不做校验；字段都是不可变的基本类型，关闭 gc 跟踪后构造更快、占用更少。
+    """
+    name: str  # 文件名
+    path: str  # 相对路径
+    extension: str  # 文件扩展名
+    size: int  # 文件大小（字节）
+    modified_time: Optional[datetime]  # 修改时间（不读取 stat 时为 None）
+    is_directory: bool = False  # 是否为目录
+
+class _FileColumns(NamedTuple):
+    """self.files 的按列存储（SoA），供统计和过滤做向量化运算"""
+    source: List[FileInfo]  # 生成这些列时的文件列表
+    sizes: "np.ndarray"  # int64，文件大小
+    is_dir: "np.ndarray"  # bool，是否为目录
+    ext_ids: "np.ndarray"  # int32，扩展名编号
+    ext_names: List[str]  # 编号 → 扩展名
+
+@lru_cache(maxsize=50_000)
+def _build_file_info(name: str, relative_path: str, size: int, mtime_ns: int, is_dir: bool) -> FileInfo:
+    """按 (名称, 相对路径, 大小, 修改时间, 是否目录) 缓存文件信息
+    
+    界面上反复刷新同一目录时，未修改的文件直接复用上次的 FileInfo，
+    省去扩展名计算和 datetime 构造；参数都是可哈希的基本类型。
+    """
+    # 文件夹扩展名设为空
+    file_ext = "" if is_dir else _lower_extension(name)
+    return FileInfo(name, relative_path, file_ext, size, datetime.fromtimestamp(mtime_ns / 1e9), is_dir)
 
 class DirectoryScanner:
     """目录扫描器"""
     
-    def __init__(self, base_path: Path):
+    # 递归扫描时并发读取目录的线程数；目录读取以 I/O 为主，为 1 时退化为单线程遍历
+    SCAN_WORKERS = min(32, max(4, (os.cpu_count() or 1) * 2))
+    # 安装了 numpy 且文件数不少于该值时，统计和过滤改用按列存储的向量化运算
+    COLUMNAR_MIN_FILES = 2000
+    # 并发扫描时同时提交给线程池的目录数上限，超出的子目录排队等待
+    SCAN_MAX_IN_FLIGHT = SCAN_WORKERS * 4
+    # iter_scan_directory 每批产出的文件数
+    SCAN_BATCH_SIZE = 1000
+    
+    def __init__(self, base_path: Path, scan_all_files: Optional[bool] = None, max_files: Optional[int] = None):
         self.base_path = base_path.resolve()
+        # 文件数量限制：未指定时取构造时的配置，扫描过程中不再读取全局配置
+        self.scan_all_files = config._config.get('scan_all_files', False) if scan_all_files is None else scan_all_files
+        self.max_files = config.max_files if max_files is None else max_files
         self.files: List[FileInfo] = []
+        self._columns: Optional[_FileColumns] = None
+        # 上次扫描读取过的目录及其 st_mtime_ns，供 ScanCache 判断结果是否仍然有效
+        self.scanned_dirs: Dict[str, int] = {}
+        # 上次扫描是否因达到文件数量限制而提前结束
+        self.truncated = False
+        # 基础目录和排除目录只在构造时解析一次，统一以分隔符结尾，逐个路径只需做字符串前缀比较
+        self._base_str = str(self.base_path)
+        self._base_prefix = os.path.join(self._base_str, "")
+        self._excluded_prefixes = config.resolved_excluded_paths
+        # 网络文件系统上可开启 statx(AT_STATX_DONT_SYNC)，直接使用本地缓存的属性；
+        # 本地磁盘上 ctypes 调用反而比 os.stat 慢，因此默认关闭
+        self._use_statx = _statx.AVAILABLE and config._config.get('statx_dont_sync', False)
         logger.info(f"初始化目录扫描器: {self.base_path}")
     
     def is_path_safe(self, path: Path) -> bool:
-        """检查路径是否安全（不在排除列表中）"""
+        """检查路径是否安全（不在排除列表中）
+        
+        扫描产生的路径都以已解析的基础目录开头，这里不再逐个 resolve()，
+        只做 abspath 规范化（纯字符串运算，可消除 ".."）后比较前缀。
+        """
         try:
-            # 解析路径
-            resolved_path = path.resolve()
+            path_str = os.path.join(os.path.abspath(path), "")
             
             # 检查是否在用户指定的基础路径下
-            if not str(resolved_path).startswith(str(self.base_path)):
+            if not path_str.startswith(self._base_prefix):
                 logger.warning(f"路径不在基础目录下: {path}")
                 return False
             
             # 检查是否在排除路径列表中（主要针对系统目录）
-            for excluded_path in config.excluded_paths:
-                try:
-                    excluded = Path(excluded_path).expanduser().resolve()
-                    if str(resolved_path).startswith(str(excluded)):
-                        logger.debug(f"路径在排除列表中: {path} -> {excluded_path}")
-                        return False
-                except Exception:
-                    # 如果排除路径解析失败，跳过检查
-                    continue
+            if path_str.startswith(self._excluded_prefixes):
+                logger.debug("路径在排除列表中: %s", path)
+                return False
             
             # 检查是否是隐藏文件（以.开头）
-            if path.name.startswith('.'):
-                logger.debug(f"跳过隐藏文件: {path.name}")
+            name = os.path.basename(path_str[:-1])
+            if name[0:1] == '.':
+                logger.debug("跳过隐藏文件: %s", name)
                 return False
             
             return True
@@ -61,129 +134,307 @@ class DirectoryScanner:
             logger.error(f"路径安全检查失败: {path} - {e}")
             return False
     
-    def scan_directory(self, recursive: bool = False) -> List[FileInfo]:
-        """扫描目录"""
+    def _dir_safe(self, entry: os.DirEntry) -> bool:
+        """检查扫描中遇到的子目录是否可以进入
+        
+        父目录已经通过检查，子目录必然位于基础目录下，只需检查隐藏名称和排除前缀。
+        """
+        if entry.name[0:1] == '.':
+            logger.debug("跳过隐藏目录: %s", entry.name)
+            return False
+        if (entry.path + os.sep).startswith(self._excluded_prefixes):
+            logger.debug("路径在排除列表中: %s", entry.path)
+            return False
+        return True
+    
+    def _symlink_target_safe(self, entry: os.DirEntry) -> bool:
+        """符号链接只在这里 realpath 一次，检查指向的位置在基础目录下且不在排除列表中"""
+        target = os.path.realpath(entry.path)
+        if not (target + os.sep).startswith(self._base_prefix):
+            logger.debug("符号链接指向基础目录之外: %s -> %s", entry.path, target)
+            return False
+        if (target + os.sep).startswith(self._excluded_prefixes):
+            logger.debug("符号链接指向排除路径: %s -> %s", entry.path, target)
+            return False
+        return True
+    
+    def scan_directory(self, recursive: bool = False, need_stat: bool = True) -> List[FileInfo]:
+        """扫描目录，返回完整的文件列表（同时保存在 self.files 中）"""
+        self.files = list(self.iter_files(recursive, need_stat))
+        if logger.isEnabledFor(logging.INFO):
+            # 只在 Python 层遍历一次取出大小，min/max 在列表上以 C 循环完成
+            sizes = [f.size for f in self.files] or [0]
+            logger.info("文件大小范围: %d - %d bytes", min(sizes), max(sizes))
+        return self.files
+    
+    def iter_scan_directory(self, recursive: bool = False, need_stat: bool = True,
+                            batch_size: Optional[int] = None) -> Iterator[List[FileInfo]]:
+        """分批扫描目录，每批最多 batch_size 个文件信息
+        
+        每产出一批时，这一批已追加到 self.files 中，调用方可以边扫描边显示进度；
+        遍历结束后 self.files 与 scan_directory() 的结果相同。
+        """
+        batch_size = batch_size or self.SCAN_BATCH_SIZE
+        self.files = files = []
+        batch = []
+        for file_info in self.iter_files(recursive, need_stat):
+            batch.append(file_info)
+            if len(batch) >= batch_size:
+                files.extend(batch)
+                yield batch
+                batch = []
+        if batch:
+            files.extend(batch)
+            yield batch
+    
+    def iter_files(self, recursive: bool = False, need_stat: bool = True) -> Iterator[FileInfo]:
+        """流式扫描目录，逐个产出文件信息
+        
+        不在内存中保留完整列表，可直接交给 get_files_summary / filter_files 等按需消费。
+        need_stat=False 时只列出名称和类型（来自 readdir 的 d_type），不对文件做 stat，
+        产出的 size 为 0、modified_time 为 None，适合只需要文件列表的场景。
+        """
         logger.info(f"开始扫描目录: {self.base_path} (recursive={recursive})")
         
-        if not self.base_path.exists():
-            raise FileNotFoundError(f"目录不存在: {self.base_path}")
+        # 一次 stat 同时判断是否存在和是否为目录
+        try:
+            base_stat = os.stat(self._base_str)
+        except (FileNotFoundError, NotADirectoryError):
+            raise FileNotFoundError(f"目录不存在: {self.base_path}") from None
         
-        if not self.base_path.is_dir():
+        if not stat.S_ISDIR(base_stat.st_mode):
             raise ValueError(f"路径不是目录: {self.base_path}")
+        self.scanned_dirs = {self._base_str: base_stat.st_mtime_ns}
+        self.truncated = False
         
-        self.files = []
         file_count = 0
         skipped_count = 0
+        # 文件数量上限（扫描所有文件时为 None）
+        limit = None if self.scan_all_files else self.max_files
         
         try:
-            if recursive:
-                # 递归扫描
-                logger.info("开始递归扫描...")
-                for root, dirs, files in os.walk(self.base_path):
-                    root_path = Path(root)
-                    
-                    # 检查目录是否安全
-                    if not self.is_path_safe(root_path):
-                        logger.debug(f"跳过目录（安全限制）: {root_path}")
-                        dirs[:] = []  # 跳过此目录
-                        skipped_count += len(files)
-                        continue
-                    
-                    # 处理文件
-                    for filename in files:
-                        file_path = root_path / filename
-                        
-                        if self.is_path_safe(file_path):
-                            try:
-                                file_info = self._create_file_info(file_path)
-                                self.files.append(file_info)
-                                file_count += 1
-                                
-                                # 定期输出进度
-                                if file_count % 100 == 0:
-                                    logger.info(f"已扫描 {file_count} 个文件...")
-                                
-                                # 检查文件数量限制（除非设置为扫描所有文件）
-                                if not config._config.get('scan_all_files', False) and file_count >= config.max_files:
-                                    logger.warning(f"达到文件数量限制: {config.max_files}，可在设置中开启'扫描所有文件'选项")
-                                    break
-                                    
-                            except Exception as e:
-                                logger.error(f"处理文件失败: {file_path} - {e}")
-                                skipped_count += 1
-                        else:
-                            skipped_count += 1
-                        
-                        if not config._config.get('scan_all_files', False) and file_count >= config.max_files:
-                            break
-                    
-                    if not config._config.get('scan_all_files', False) and file_count >= config.max_files:
-                        break
+            logger.info("开始递归扫描..." if recursive else "开始扫描当前目录...")
+            # 递归扫描时基础目录本身也要满足安全限制
+            if recursive and not self.is_path_safe(self.base_path):
+                infos = ()
+            elif recursive and self.SCAN_WORKERS > 1:
+                infos = self._iter_file_infos_parallel(need_stat)
             else:
-                # 只扫描当前目录
-                logger.info("开始扫描当前目录...")
-                for item in self.base_path.iterdir():
-                    if self.is_path_safe(item):
-                        try:
-                            file_info = self._create_file_info(item)
-                            self.files.append(file_info)
-                            file_count += 1
-                            
-                            # 检查文件数量限制（除非设置为扫描所有文件）
-                            if not config._config.get('scan_all_files', False) and file_count >= config.max_files:
-                                logger.warning(f"达到文件数量限制: {config.max_files}，可在设置中开启'扫描所有文件'选项")
-                                break
-                                
-                        except Exception as e:
-                            logger.error(f"处理项目失败: {item} - {e}")
-                            skipped_count += 1
-                    else:
-                        skipped_count += 1
+                infos = (self._entry_to_file_info(entry, need_stat) for entry in self._iter_entries(self._base_str, recursive))
+            
+            for file_info in infos:
+                if file_info is None:
+                    skipped_count += 1
+                    continue
+                
+                yield file_info
+                file_count += 1
+                
+                # 定期输出进度
+                if file_count % 100 == 0:
+                    logger.info("已扫描 %d 个文件...", file_count)
+                
+                # 检查文件数量限制（除非设置为扫描所有文件）
+                if limit is not None and file_count >= limit:
+                    logger.warning(f"达到文件数量限制: {limit}，可在设置中开启'扫描所有文件'选项")
+                    self.truncated = True
+                    break
         
         except Exception as e:
             logger.error(f"扫描目录失败: {self.base_path} - {e}")
             raise
         
-        logger.info(f"扫描完成，找到 {len(self.files)} 个文件，跳过 {skipped_count} 个文件")
-        logger.info(f"文件大小范围: {min(f.size for f in self.files) if self.files else 0} - {max(f.size for f in self.files) if self.files else 0} bytes")
-        return self.files
+        logger.info(f"扫描完成，找到 {file_count} 个文件，跳过 {skipped_count} 个文件")
     
-    def _create_file_info(self, file_path: Path) -> FileInfo:
-        """创建文件信息对象"""
-        stat = file_path.stat()
-        is_dir = file_path.is_dir()
-        # 计算相对路径
+    def _iter_entries(self, root: str, recursive: bool) -> Iterator[os.DirEntry]:
+        """基于 os.scandir 遍历目录项
+        
+        非递归时产出 root 下的所有目录项（包括子目录）；递归时只产出文件，
+        遇到安全的子目录立即进入（先序深度优先），不进入指向目录的符号链接，
+        无法读取的子目录跳过。各层打开的 scandir 迭代器保存在栈上，
+        调用方提前结束遍历时在 finally 中统一关闭。
+        已进入过的目录按 (st_dev, st_ino) 记录，绑定挂载等造成的环路只会走一遍。
+        """
+        seen = set()
+        stack = [os.scandir(root)]
         try:
-            relative_path = file_path.relative_to(self.base_path)
-        except ValueError:
-            relative_path = file_path.name
-        # 文件夹大小设为0，扩展名设为空
-        file_size = 0 if is_dir else stat.st_size
-        file_ext = "" if is_dir else file_path.suffix.lower()
-        return FileInfo(
-            name=file_path.name,
-            path=str(relative_path),
-            extension=file_ext,
-            size=file_size,
-            modified_time=datetime.fromtimestamp(stat.st_mtime),
-            is_directory=is_dir
-        )
+            while stack:
+                entry = next(stack[-1], None)
+                if entry is None:
+                    stack.pop().close()
+                    continue
+                
+                if recursive and entry.is_dir():
+                    if entry.is_symlink() or not self._dir_safe(entry):
+                        logger.debug("跳过目录（安全限制）: %s", entry.path)
+                        continue
+                    try:
+                        key = self._dir_key(entry)
+                        if key in seen:
+                            logger.debug("跳过已扫描的目录: %s", entry.path)
+                            continue
+                        seen.add(key)
+                        # stat 结果已缓存在目录项上，不会再次系统调用
+                        self.scanned_dirs[entry.path] = entry.stat(follow_symlinks=False).st_mtime_ns
+                        stack.append(os.scandir(entry.path))
+                    except OSError as e:
+                        logger.warning("无法读取目录: %s - %s", entry.path, e)
+                    continue
+                
+                yield entry
+        finally:
+            for iterator in stack:
+                iterator.close()
+    
+    def _iter_file_infos_parallel(self, need_stat: bool = True) -> Iterator[Optional[FileInfo]]:
+        """多线程递归扫描：每个目录作为一个任务交给线程池，读到的子目录继续提交
+        
+        各目录的 scandir 和 stat 在工作线程中重叠进行，结果在调用方线程中按目录的提交顺序
+        （广度优先，同一目录内按名称排序）产出，目录未变化时每次扫描的顺序相同，
+        文件数量限制保留的文件、预览顺序和整理方案的缓存键都不会随线程调度变化；
+        None 表示被跳过的条目。调用方提前结束时取消尚未开始的目录任务。
+        子目录的 (st_dev, st_ino) 在调用方线程中去重，同一目录只提交一次。
+        调用方结束遍历（如达到文件数量限制）时设置 stop，正在读取的目录也会尽快停下。
+        同时提交的目录任务不超过 SCAN_MAX_IN_FLIGHT 个，其余子目录在队列中等待，
+        调用方消费较慢时工作线程不会远远跑在前面，已读取但未产出的结果也不会无限堆积。
+        """
+        seen = set()
+        stop = threading.Event()
+        backlog = deque()
+        with ThreadPoolExecutor(max_workers=self.SCAN_WORKERS) as pool:
+            pending = deque([pool.submit(self._scan_single_directory, self._base_str, need_stat, stop)])
+            try:
+                while pending:
+                    # 总是等待最早提交的目录，其余目录在线程池中继续读取
+                    infos, subdirs = pending[0].result()
+                    pending.popleft()
+                    for subdir, key, mtime_ns in subdirs:
+                        if key in seen:
+                            logger.debug("跳过已扫描的目录: %s", subdir)
+                            continue
+                        seen.add(key)
+                        self.scanned_dirs[subdir] = mtime_ns
+                        backlog.append(subdir)
+                    while backlog and len(pending) < self.SCAN_MAX_IN_FLIGHT:
+                        pending.append(pool.submit(self._scan_single_directory, backlog.popleft(), need_stat, stop))
+                    yield from infos
+            finally:
+                stop.set()
+                for future in pending:
+                    future.cancel()
+    
+    def _scan_single_directory(self, dir_path: str, need_stat: bool = True,
+                               stop: Optional[threading.Event] = None) -> Tuple[List[Optional[FileInfo]], List[Tuple[str, Tuple[int, int], int]]]:
+        """读取单个目录（在工作线程中执行），返回 (文件信息列表, 需要继续扫描的 (子目录, 目录标识, 修改时间))
+        
+        目录项按名称排序后处理，结果与 readdir 返回的顺序无关。
+        """
+        infos = []
+        subdirs = []
+        try:
+            with os.scandir(dir_path) as iterator:
+                entries = sorted(iterator, key=_entry_name)
+            for entry in entries:
+                if stop is not None and stop.is_set():
+                    break
+                if entry.is_dir():
+                    # 不进入指向目录的符号链接
+                    if not entry.is_symlink() and self._dir_safe(entry):
+                        try:
+                            subdirs.append((entry.path, self._dir_key(entry),
+                                            entry.stat(follow_symlinks=False).st_mtime_ns))
+                        except OSError as e:
+                            logger.warning("无法读取目录: %s - %s", entry.path, e)
+                    else:
+                        logger.debug("跳过目录（安全限制）: %s", entry.path)
+                    continue
+                infos.append(self._entry_to_file_info(entry, need_stat))
+        except OSError as e:
+            # 无法读取的子目录跳过；基础目录本身读取失败则向上抛出
+            if dir_path == self._base_str:
+                raise
+            logger.warning("无法读取目录: %s - %s", dir_path, e)
+        return infos, subdirs
+    
+    @staticmethod
+    def _dir_key(entry: os.DirEntry) -> Tuple[int, int]:
+        """目录的唯一标识 (st_dev, st_ino)；stat 结果缓存在目录项上，每个目录只需一次系统调用"""
+        st = entry.stat(follow_symlinks=False)
+        return st.st_dev, st.st_ino
     
-    def get_files_summary(self) -> Dict:
-        """获取文件统计摘要"""
-        if not self.files:
-            return {"total_files": 0, "total_size": 0, "extensions": {}, "total_directories": 0}
-        files_only = [f for f in self.files if not f.is_directory]
-        dirs_only = [f for f in self.files if f.is_directory]
-        total_size = sum(file.size for file in files_only)
-        extensions = {}
-        for file in files_only:
-            ext = file.extension or "无扩展名"
-            extensions[ext] = extensions.get(ext, 0) + 1
+    def _entry_to_file_info(self, entry: os.DirEntry, need_stat: bool = True) -> Optional[FileInfo]:
+        """检查目录项并创建文件信息，不安全或处理失败时返回 None
+        
+        目录项都来自已通过检查的目录，基础目录在扫描开始时已验证过，这里不再逐个比较前缀。
+        整个检查只使用 DirEntry 上已有的字符串，不构造 Path 对象。
+        """
+        try:
+            if entry.is_dir():
+                if not self._dir_safe(entry):
+                    return None
+            elif entry.name[0:1] == '.':
+                logger.debug("跳过隐藏文件: %s", entry.name)
+                return None
+            # 指向文件或目录的符号链接都要检查目标位置（非递归扫描会列出目录链接）
+            if entry.is_symlink() and not self._symlink_target_safe(entry):
+                return None
+            return self._create_file_info_from_entry(entry, need_stat)
+        except (OSError, ValueError, OverflowError) as e:
+            # stat/realpath 只会抛出 OSError，异常的修改时间在 fromtimestamp 中抛出 ValueError/OverflowError；
+            # 跳过的数量会在扫描结束时汇总输出，逐个条目只记 DEBUG 日志
+            logger.debug("处理项目失败: %s - %s", entry.path, e)
+            return None
+    
+    def _create_file_info_from_entry(self, entry: os.DirEntry, need_stat: bool = True) -> FileInfo:
+        """根据 os.scandir 的目录项创建文件信息对象
+        
+        目录项的类型来自 readdir 返回的 d_type，stat 结果也会缓存在目录项上，
+        每个条目只需一次 stat 系统调用；need_stat=False 时完全不做 stat。
+        """
+        if not need_stat:
+            is_dir = entry.is_dir()
+            name = entry.name
+            return FileInfo(name, entry.path[len(self._base_prefix):], "" if is_dir else _lower_extension(name), 0, None, is_dir)
+        if self._use_statx:
+            _, st_size, st_mtime_ns = _statx.stat(entry.path)
+        else:
+            st = entry.stat()
+            # st[6] 即 st_size，按下标取值比属性访问快；
+            # st[8] 是截断为整数秒的 st_mtime，精度不够作缓存键，st_mtime_ns 仍按属性读取
+            st_size, st_mtime_ns = st[6], st.st_mtime_ns
+        is_dir = entry.is_dir()
+        # 目录项路径都以基础目录为前缀，直接切片得到相对路径，无需 relpath 的规范化
+        relative_path = entry.path[len(self._base_prefix):]
+        # 文件夹大小设为0
+        return _build_file_info(entry.name, relative_path, 0 if is_dir else st_size, st_mtime_ns, is_dir)
+    
+    def get_files_summary(self, files: Optional[Iterable[FileInfo]] = None) -> Dict:
+        """获取文件统计摘要
+        
+        files 默认为上次扫描的结果，也可以传入 iter_files() 的生成器，单次遍历完成统计。
+        """
+        columns = self._get_columns() if files is None else None
+        if columns is not None:
+            return self._columnar_summary(columns)
+        
+        total_items = 0
+        total_directories = 0
+        total_size = 0
+        extensions = Counter()
+        for file in self.files if files is None else files:
+            total_items += 1
+            if file.is_directory:
+                total_directories += 1
+            else:
+                total_size += file.size
+                extensions[file.extension or "无扩展名"] += 1
+        
+        if not total_items:
+            return {"total_files": 0, "total_size": 0, "extensions": extensions, "total_directories": 0}
         return {
-            "total_files": len(files_only),
-            "total_directories": len(dirs_only),
-            "total_items": len(self.files),
+            "total_files": total_items - total_directories,
+            "total_directories": total_directories,
+            "total_items": total_items,
             "total_size": total_size,
             "extensions": extensions,
             "scan_path": str(self.base_path)
@@ -191,18 +442,170 @@ class DirectoryScanner:
     
     def filter_files(self, extensions: Optional[List[str]] = None, 
                     min_size: Optional[int] = None,
-                    max_size: Optional[int] = None) -> List[FileInfo]:
-        """过滤文件"""
-        filtered_files = self.files.copy()
+                    max_size: Optional[int] = None,
+                    files: Optional[Iterable[FileInfo]] = None) -> List[FileInfo]:
+        """过滤文件
         
-        if extensions:
-            filtered_files = [f for f in filtered_files if f.extension.lower() in [ext.lower() for ext in extensions]]
+        所有条件合并为一次遍历；files 默认为上次扫描的结果，也可以传入 iter_files() 的生成器。
+        """
+        allowed_extensions = frozenset(ext.lower() for ext in extensions) if extensions else None
+        columns = self._get_columns() if files is None else None
+        if columns is not None:
+            return self._columnar_filter(columns, allowed_extensions, min_size, max_size)
         
-        if min_size is not None:
-            filtered_files = [f for f in filtered_files if f.size >= min_size]
+        low = min_size if min_size is not None else float("-inf")
+        high = max_size if max_size is not None else float("inf")
+        
+        total = 0
+        filtered_files = []
+        for f in self.files if files is None else files:
+            total += 1
+            if (allowed_extensions is None or f.extension.lower() in allowed_extensions) and low <= f.size <= high:
+                filtered_files.append(f)
         
+        logger.info(f"文件过滤完成: {total} -> {len(filtered_files)}")
+        return filtered_files
+    
+    def _get_columns(self) -> Optional[_FileColumns]:
+        """按需把 self.files 转为按列存储，列表未变化时复用上次的结果
+        
+        未安装 numpy 或文件数较少时返回 None，调用方使用逐个遍历的实现。
+        """
+        files = self.files
+        if np is None or len(files) < self.COLUMNAR_MIN_FILES:
+            return None
+        columns = self._columns
+        if columns is not None and columns.source is files and len(columns.sizes) == len(files):
+            return columns
+        
+        count = len(files)
+        ext_table: Dict[str, int] = {}
+        ext_ids = np.fromiter(
+            (ext_table.setdefault(f.extension, len(ext_table)) for f in files), dtype=np.int32, count=count
+        )
+        self._columns = _FileColumns(
+            source=files,
+            sizes=np.fromiter((f.size for f in files), dtype=np.int64, count=count),
+            is_dir=np.fromiter((f.is_directory for f in files), dtype=np.bool_, count=count),
+            ext_ids=ext_ids,
+            ext_names=list(ext_table),
+        )
+        return self._columns
+    
+    def _columnar_summary(self, columns: _FileColumns) -> Dict:
+        """get_files_summary 的向量化实现：求和与扩展名计数各是一次 C 循环"""
+        is_file = ~columns.is_dir
+        total_items = len(columns.sizes)
+        total_directories = total_items - int(is_file.sum())
+        counts = np.bincount(columns.ext_ids[is_file], minlength=len(columns.ext_names))
+        extensions = Counter()
+        for ext_id in np.flatnonzero(counts).tolist():
+            extensions[columns.ext_names[ext_id] or "无扩展名"] += int(counts[ext_id])
+        return {
+            "total_files": total_items - total_directories,
+            "total_directories": total_directories,
+            "total_items": total_items,
+            "total_size": int(columns.sizes[is_file].sum()),
+            "extensions": extensions,
+            "scan_path": str(self.base_path)
+        }
+    
+    def _columnar_filter(self, columns: _FileColumns, allowed_extensions: Optional[frozenset],
+                         min_size: Optional[int], max_size: Optional[int]) -> List[FileInfo]:
+        """filter_files 的向量化实现：各条件合成一个布尔掩码后一次取出"""
+        mask = np.ones(len(columns.sizes), dtype=np.bool_)
+        if allowed_extensions is not None:
+            allowed_ids = [i for i, ext in enumerate(columns.ext_names) if ext.lower() in allowed_extensions]
+            mask &= np.isin(columns.ext_ids, allowed_ids)
+        if min_size is not None:
+            mask &= columns.sizes >= min_size
         if max_size is not None:
-            filtered_files = [f for f in filtered_files if f.size <= max_size]
+            mask &= columns.sizes <= max_size
         
-        logger.info(f"文件过滤完成: {len(self.files)} -> {len(filtered_files)}")
-        return filtered_files
\ No newline at end of file
+        files = columns.source
+        filtered_files = [files[i] for i in np.flatnonzero(mask).tolist()]
+        logger.info(f"文件过滤完成: {len(files)} -> {len(filtered_files)}")
+        return filtered_files
+
+class ScanCache:
+    """扫描结果的持久化缓存（sqlite，默认位于 ~/.freeu/scan_cache.db）
+    
+    按 (基础目录, 是否递归) 保存上次扫描的文件列表，以及扫描时读取过的每个目录的 st_mtime_ns。
+    目录中新增、删除或重命名条目都会更新该目录的修改时间，所以只要逐个 stat 这些目录
+    （目录数远少于文件数）且全部一致，就可以直接复用上次的结果，不必重新遍历。
+    只修改文件内容不会改变所在目录的修改时间，命中缓存时这类文件的大小和修改时间可能是旧值，
+    因此默认关闭（配置项 scan_cache）。结果以 msgpack 保存，读取时按 FileInfo 结构解码，
+    不会像 pickle 那样执行缓存文件中的代码。
+    """
+    
+    # 最多保留的扫描结果条数，超出时删除最早写入的
+    MAX_ENTRIES = 8
+    
+    def __init__(self, db_path: Optional[Path] = None):
+        self.db_path = db_path or config.config_dir / 'scan_cache.db'
+    
+    def _connect(self) -> sqlite3.Connection:
+        """打开数据库（每次调用新建连接，可在任意线程中使用）"""
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.db_path), timeout=5)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS scan_cache ("
+            "path TEXT NOT NULL, recursive INTEGER NOT NULL, options TEXT NOT NULL, "
+            "dirs BLOB NOT NULL, files BLOB NOT NULL, updated_at REAL NOT NULL, "
+            "PRIMARY KEY (path, recursive))"
+        )
+        return conn
+    
+    @staticmethod
+    def _options(scanner: DirectoryScanner, need_stat: bool) -> str:
+        """影响扫描结果的设置，与缓存中记录的不同时视为未命中"""
+        limit = None if scanner.scan_all_files else scanner.max_files
+        return repr((need_stat, scanner._excluded_prefixes, limit))
+    
+    def get(self, scanner: DirectoryScanner, recursive: bool, need_stat: bool = True) -> Optional[List[FileInfo]]:
+        """查找 scanner 所在目录的缓存结果，任一目录已修改或缓存不可用时返回 None"""
+        try:
+            with closing(self._connect()) as conn:
+                row = conn.execute(
+                    "SELECT options, dirs, files FROM scan_cache WHERE path = ? AND recursive = ?",
+                    (scanner._base_str, int(recursive))
+                ).fetchone()
+            if row is None or row[0] != self._options(scanner, need_stat):
+                return None
+            dirs = msgspec.msgpack.decode(row[1], type=Dict[str, int])
+            for dir_path, mtime_ns in dirs.items():
+                try:
+                    if os.stat(dir_path, follow_symlinks=False).st_mtime_ns != mtime_ns:
+                        logger.debug("目录已修改，扫描缓存失效: %s", dir_path)
+                        return None
+                except OSError:
+                    return None
+            files = msgspec.msgpack.decode(row[2], type=List[FileInfo])
+        except Exception as e:
+            # 缓存损坏或不可读时按未命中处理，重新扫描
+            logger.warning(f"读取扫描缓存失败: {e}")
+            return None
+        scanner.scanned_dirs = dirs
+        scanner.truncated = False
+        logger.info(f"使用扫描缓存: {scanner.base_path}（{len(files)} 个文件，检查了 {len(dirs)} 个目录）")
+        return files
+    
+    def put(self, scanner: DirectoryScanner, recursive: bool, need_stat: bool = True) -> None:
+        """保存 scanner 上次扫描的结果；因数量限制提前结束的扫描不完整，不保存"""
+        if scanner.truncated:
+            return
+        try:
+            dirs = msgspec.msgpack.encode(scanner.scanned_dirs)
+            files = msgspec.msgpack.encode(scanner.files)
+            with closing(self._connect()) as conn, conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO scan_cache VALUES (?, ?, ?, ?, ?, ?)",
+                    (scanner._base_str, int(recursive), self._options(scanner, need_stat), dirs, files, time.time())
+                )
+                conn.execute(
+                    "DELETE FROM scan_cache WHERE rowid NOT IN "
+                    "(SELECT rowid FROM scan_cache ORDER BY updated_at DESC LIMIT ?)",
+                    (self.MAX_ENTRIES,)
+                )
+        except Exception as e:
+            logger.warning(f"保存扫描缓存失败: {e}")
@@ -6,6 +6,8 @@ FreeU - AI文件整理助手
 
 import sys
 import os
+import signal
+import importlib.util
 from pathlib import Path
 
 # 将项目根目录添加到Python路径
@@ -13,6 +15,26 @@ current_dir = Path(__file__).parent
 project_root = current_dir.parent
 sys.path.insert(0, str(project_root))
 
+def _install_sigterm_handler() -> None:
+    """收到 SIGTERM 时先写入尚未保存的配置和缓冲中的日志，再按默认方式结束进程
+    
+    Electron 以 SIGTERM 停止后端，默认处理直接终止进程，不会运行 atexit 中的 config.flush()
+    和 logging.shutdown，退出前刚修改、仍在 SAVE_DELAY 延迟中的设置和最后几行日志会丢失。
+    """
+    def handle_sigterm(signum, frame):
+        try:
+            from src.utils.config import config
+            from src.utils.logger import flush_logging
+            try:
+                config.flush()
+            finally:
+                flush_logging()
+        finally:
+            signal.signal(signum, signal.SIG_DFL)
+            os.kill(os.getpid(), signum)
+    
+    signal.signal(signal.SIGTERM, handle_sigterm)
+
 def main():
     """主函数"""
     try:
@@ -22,24 +44,22 @@ def main():
             print(f"当前版本: Python {sys.version}")
             sys.exit(1)
         
-        # 检查依赖
-        try:
-            import gradio
-            import anthropic
-            import pydantic
-        except ImportError as e:
+        # 检查依赖：find_spec 只查找模块而不执行导入，真正的导入在 create_app() 中进行
+        missing = [name for name in ("gradio", "anthropic", "msgspec") if importlib.util.find_spec(name) is None]
+        if missing:
             print("❌ 错误: 缺少必要的依赖包")
             print(f"请运行: pip install -r requirements.txt")
-            print(f"具体错误: {e}")
+            print(f"缺少: {', '.join(missing)}")
             sys.exit(1)
         
         # 启动应用
         print("🚀 启动 FreeU - AI文件整理助手")
         print("正在初始化界面...")
         
-        from src.ui.gradio_interface import create_app
+        from src.ui.gradio_interface import create_app, LAUNCH_MAX_THREADS
         
         app = create_app()
+        _install_sigterm_handler()
         
         print("✅ 应用启动成功！")
         print("📱 请打开浏览器访问: http://127.0.0.1:7861")
@@ -51,7 +71,8 @@ def main():
             server_port=7861,
             share=False,
             show_error=True,
-            quiet=False
+            quiet=False,
+            max_threads=LAUNCH_MAX_THREADS
         )
         
     except KeyboardInterrupt:
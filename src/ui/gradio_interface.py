@@ -1,71 +1,268 @@
-import gradio as gr
+import os
+import asyncio
+import heapq
+import hashlib
 import logging
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import TYPE_CHECKING, AsyncIterator, Callable, Dict, Iterator, List, Optional, Union
 from datetime import datetime
-from src.core.scanner import DirectoryScanner, FileInfo
-from src.core.ai_engine import MultiAIEngine, FileAction
+from msgspec import msgpack
+from src.core.scanner import DirectoryScanner, FileInfo, ScanCache
+from src.core.ai_adapter import format_file_size
 from src.core.file_executor import FileExecutor
 from src.utils.config import config
 from src.utils.logger import (
     setup_logging, log_operation_start, log_operation_complete, 
     log_operation_error, log_operation_warning, log_progress
 )
-import json
+
+# gradio、pandas 的导入链很重（FastAPI、starlette 等），AI 引擎也只在用到时才需要，
+# 都推迟到使用处导入，只导入本模块的工具和测试不必付出这部分启动开销
+if TYPE_CHECKING:
+    import gradio as gr
+    import pandas as pd
+    from src.core.ai_engine import MultiAIEngine, FileAction, AIResponse
 
 # 初始化日志
 logger = setup_logging()
 
+# 默认整理提示词
+_DEFAULT_PROMPT = """你是一个专业的文件整理助手。请根据文件的类型、内容和用途，智能地将文件归类整理到合适的文件夹中。
+
+整理原则：
+1. 按文件类型分类（图片、文档、视频、音频、代码等）
+2. 按项目或主题归类（工作、学习、个人等）
+3. 按时间归档（如需要）
+4. 保持目录结构清晰，便于查找
+5. 相似或相关的文件放在一起
+6. 为每个文件夹取一个清晰易懂的名称
+
+请分析提供的文件列表，生成合理的整理方案。"""
+
+# 常用目录（快捷按钮），只在导入时计算一次
+_HOME = Path.home()
+_HOME_STR = str(_HOME)
+_COMMON_DIRS = {
+    "desktop": _HOME / "Desktop",
+    "documents": _HOME / "Documents",
+    "downloads": _HOME / "Downloads",
+    "pictures": _HOME / "Pictures",
+    "home": _HOME
+}
+
+@lru_cache(maxsize=16)
+def _dir_exists(path: str) -> bool:
+    """常用目录是否存在；结果在进程内缓存，这些目录在一次会话中基本不会变化"""
+    return os.path.exists(path)
+
+# 整理方案预览表格的列
+PREVIEW_HEADERS = ["状态", "源文件", "目标路径", "原因", "操作", "备注"]
+
+# 界面中的固定内容，只在导入时构建一次
+_PROVIDER_CHOICES = ["claude", "openai", "kimi", "glm", "openrouter"]
+
+_USAGE_MD = """
+### 📖 使用说明
+1. **选择目录**: 点击快捷按钮或输入要整理的目录路径，点击"扫描目录"（自动递归扫描所有文件）
+2. **AI整理**: 点击"开始智能整理"，AI将根据预设规则自动生成整理方案
+3. **预览方案**: 在右侧预览表格中查看详细的整理操作
+4. **执行整理**: 确认无误后点击"执行整理"，完成后查看详细报告
+
+### ⚠️ 注意事项
+- AI整理规则可在'AI设置'中自定义
+- 只执行移动操作，不会删除文件
+- 自动跳过隐藏文件和系统文件
+- 首次使用需要在'AI设置'中配置API Key
+- 建议先备份重要文件
+"""
+
+_AI_SETTINGS_MD = """
+### 🔑 获取API Key
+- **Claude**: [Anthropic Console](https://console.anthropic.com/)
+- **OpenAI**: [OpenAI API Keys](https://platform.openai.com/api-keys)
+- **Kimi**: [Moonshot AI](https://platform.moonshot.cn/)
+- **GLM**: [Zhipu AI](https://open.bigmodel.cn/)
+- **OpenRouter**: [OpenRouter](https://openrouter.ai/keys)
+
+### 💡 使用建议
+1. 建议配置多个AI提供商作为备用
+2. 不同提供商的模型能力各有特色
+3. 可以根据任务复杂度选择不同的提供商
+4. API Key请妥善保管，不要分享给他人
+"""
+
+# 队列与并发设置
+QUEUE_CONCURRENCY = 8  # 队列中同时处理的事件数（设置、预览等不修改工作状态的事件）
+QUEUE_MAX_SIZE = 32  # 排队等待的最大请求数
+# 扫描、生成方案、执行方案共用 FreeUInterface 上的扫描器、文件列表和当前方案，
+# 归入同一并发组且一次只运行一个，避免扫描中途替换正在生成或执行的方案所用的文件列表、
+# 或者重复点击时对同一方案同时执行两遍移动（Gradio 3.x 没有按事件的并发限制，
+# 由 FreeUInterface 的工作区锁保证同样的串行）
+WORKSPACE_CONCURRENCY = 1
+LAUNCH_MAX_THREADS = 64  # 同步处理函数所用线程池的大小
+
+# 缓存的整理方案条数（文件列表和整理规则都相同时直接复用）
+PLAN_CACHE_SIZE = 16
+# 执行整理时推送进度的最短间隔（秒）
+PROGRESS_INTERVAL = 0.2
+
+@lru_cache(maxsize=None)
+def _is_gradio_4() -> bool:
+    """Gradio 4 起按事件设置 concurrency_limit，3.x 只支持队列整体的 concurrency_count"""
+    import gradio as gr
+    return int(gr.__version__.split(".")[0]) >= 4
+
+def _concurrency(limit: int, group: Optional[str] = None) -> Dict:
+    """生成事件绑定的并发参数，Gradio 3.x 下为空
+    
+    group 相同的事件共用同一组并发名额（Gradio 4 的 concurrency_id）。
+    """
+    if not _is_gradio_4():
+        return {}
+    params = {"concurrency_limit": limit}
+    if group:
+        params["concurrency_id"] = group
+    return params
+
+def _take_batch(iterator: Iterator, max_seconds: float = PROGRESS_INTERVAL) -> List:
+    """从迭代器中取出一批元素，取完或超过 max_seconds 后返回（在线程中调用）"""
+    batch = []
+    deadline = time.monotonic() + max_seconds
+    for item in iterator:
+        batch.append(item)
+        if time.monotonic() >= deadline:
+            break
+    return batch
+
 class FreeUInterface:
     """FreeU Gradio界面类"""
     
     def __init__(self):
         self.scanner: Optional[DirectoryScanner] = None
-        self.ai_engine: Optional[MultiAIEngine] = None
+        self.ai_engine: Optional["MultiAIEngine"] = None
         self.executor: Optional[FileExecutor] = None
         self.current_files: List[FileInfo] = []
-        self.current_actions: List[FileAction] = []
+        self.current_actions: List["FileAction"] = []
+        self._scan_cache = ScanCache()
+        # 扫描、生成方案、执行方案共用的工作区锁，在事件循环中首次使用时创建
+        self._workspace_lock: Optional[asyncio.Lock] = None
+        # AI引擎的预热：后台线程预先创建引擎，页面加载时再预先建立连接
+        self._warmup_thread: Optional[threading.Thread] = None
+        self._connection_warmed = False
+        # 整理方案缓存：键为提供商、模型、整理规则和文件列表的摘要，按最近使用顺序淘汰
+        self._plan_cache: "OrderedDict[str, AIResponse]" = OrderedDict()
+        # 最近一次计算的 (文件列表, 摘要)、(文件列表, 文件名集合)，同一个文件列表只计算一次
+        self._files_digest: Optional[tuple] = None
+        self._file_names: Optional[tuple] = None
+        # 最近一次验证的 (操作列表, 文件列表, 验证结果)，按对象身份判断是否可以复用
+        self._last_validation: Optional[tuple] = None
+        # 最近一次生成的 (操作列表, 文件列表, 预览表格)，两个列表都未替换时直接返回该表格
+        self._preview_cache: Optional[tuple] = None
+        # 配置显示文本的缓存：修改配置时递增版本号，版本一致时直接返回上次的文本
+        self._config_version = 0
+        self._config_display_cache: Optional[str] = None
+        self._config_display_version = -1
+        config.add_reload_hook(self._invalidate_config_display)
         
         logger.info("FreeU界面初始化")
     
-    def scan_directory(self, directory_path: str) -> str:
-        """扫描目录（自动递归扫描所有文件）"""
+    def _workspace(self) -> asyncio.Lock:
+        """扫描、生成方案、执行方案共用的锁，三者修改同一份扫描器、文件列表和当前方案，一次只运行一个"""
+        if self._workspace_lock is None:
+            self._workspace_lock = asyncio.Lock()
+        return self._workspace_lock
+    
+    async def scan_directory(self, directory_path: str, progress: Optional[Callable] = None) -> AsyncIterator[str]:
+        """扫描目录（自动递归扫描所有文件）
+        
+        作为生成器绑定到扫描结果文本框：每扫描完一批文件就推送一次已找到的数量，
+        完成后输出统计信息。遍历文件系统在线程中进行，不阻塞事件循环。
+        progress 为 gr.Progress 时同时更新页面上的进度条。
+        """
+        async with self._workspace():
+            async for update in self._iter_scan_updates(directory_path, progress):
+                yield update
+    
+    async def _iter_scan_updates(self, directory_path: str, progress: Optional[Callable] = None) -> AsyncIterator[str]:
+        """扫描目录并分段产出进度和统计信息（调用方需持有工作区锁）"""
         try:
             if not directory_path:
-                return "❌ 请选择目录"
+                yield "❌ 请选择目录"
+                return
             directory = Path(directory_path)
             if not directory.exists():
-                return f"❌ 目录不存在: {directory_path}"
+                yield f"❌ 目录不存在: {directory_path}"
+                return
             if not directory.is_dir():
-                return f"❌ 路径不是目录: {directory_path}"
+                yield f"❌ 路径不是目录: {directory_path}"
+                return
             log_operation_start("扫描目录", {"path": directory_path, "recursive": True})
-            # 创建扫描器
+            # 创建扫描器；执行器绑定旧的基础目录，随之重建
             self.scanner = DirectoryScanner(directory)
-            # 自动递归扫描所有文件
-            self.current_files = self.scanner.scan_directory(recursive=True)
+            self.executor = None
+            # 目录自上次扫描以来没有变化时直接使用缓存的结果
+            use_cache = config._config.get('scan_cache', False)
+            cached = await asyncio.to_thread(self._scan_cache.get, self.scanner, True) if use_cache else None
+            if cached is not None:
+                self.scanner.files = cached
+            else:
+                yield f"⏳ 正在扫描: {directory_path}"
+                # 自动递归扫描所有文件，每取一批都在线程中进行
+                batches = self.scanner.iter_scan_directory(recursive=True)
+                try:
+                    while await asyncio.to_thread(next, batches, None) is not None:
+                        if progress is not None:
+                            progress((len(self.scanner.files), None), desc="扫描中", unit="个项目")
+                        yield f"⏳ 正在扫描: {directory_path}\n📊 已找到 {len(self.scanner.files)} 个项目..."
+                finally:
+                    batches.close()
+            self.current_files = self.scanner.files
             
             # 获取统计信息
             summary = self.scanner.get_files_summary()
             log_operation_complete("扫描目录", f"找到 {summary['total_files']} 个文件")
             # 格式化输出
-            result = f"✅ 扫描完成！正在准备AI自动整理...\n\n"
-            result += f"📁 目录: {directory_path}\n"
-            result += f"📊 总项目: {summary.get('total_items', summary['total_files'])} 个\n"
-            result += f"   - 📄 文件: {summary['total_files']} 个\n"
-            result += f"   - 📂 文件夹: {summary.get('total_directories', 0)} 个\n"
-            result += f"💾 文件总大小: {self._format_file_size(summary['total_size'])}\n"
+            lines = [
+                "✅ 扫描完成！正在准备AI自动整理...",
+                "",
+                f"📁 目录: {directory_path}",
+                f"📊 总项目: {summary.get('total_items', summary['total_files'])} 个",
+                f"   - 📄 文件: {summary['total_files']} 个",
+                f"   - 📂 文件夹: {summary.get('total_directories', 0)} 个",
+                f"💾 文件总大小: {self._format_file_size(summary['total_size'])}",
+            ]
             if summary['extensions']:
-                result += "\n📎 文件类型分布（前10）:\n"
-                for ext, count in sorted(summary['extensions'].items(), key=lambda x: x[1], reverse=True)[:10]:
-                    result += f"   {ext}: {count} 个\n"
-            result += f"\n✨ 点击'开始智能整理'按钮，AI将自动为您整理文件"
-            return result
+                lines += ["", "📎 文件类型分布（前10）:"]
+                lines += [f"   {ext}: {count} 个" for ext, count in summary['extensions'].most_common(10)]
+            if cached is not None:
+                lines += ["", "⚡ 目录自上次扫描后没有变化，已直接使用上次的扫描结果"]
+            lines += ["", "✨ 点击'开始智能整理'按钮，AI将自动为您整理文件"]
+            yield "\n".join(lines)
+            # 结果先推送给页面，再写入缓存
+            if use_cache and cached is None:
+                await asyncio.to_thread(self._scan_cache.put, self.scanner, True)
         except Exception as e:
-            log_operation_error("扫描目录", str(e))
-            return f"❌ 扫描失败: {str(e)}"
+            log_operation_error("扫描目录", str(e), exc_info=True)
+            yield f"❌ 扫描失败: {str(e)}"
+    
+    async def auto_organize(self) -> tuple:
+        """AI自动整理，返回 (整理方案说明, 预览表格)
+        
+        预览表格随同一次请求返回，不再为刷新表格单独发起一次请求。
+        """
+        async with self._workspace():
+            status = await self._generate_plan_status()
+            return status, self.get_actions_preview()
     
-    def auto_organize(self) -> str:
-        """AI自动整理（使用system prompt）"""
+    async def _generate_plan_status(self) -> str:
+        """使用 system prompt 生成整理方案，返回说明文本
+        
+        使用异步客户端请求大模型，等待响应期间事件循环可以处理其他请求。
+        """
         try:
             if not self.current_files:
                 return "❌ 请先扫描目录"
@@ -74,175 +271,311 @@ class FreeUInterface:
             log_operation_start("AI自动整理", {"file_count": len(self.current_files), "prompt_length": len(system_prompt)})
             # 初始化AI引擎（使用配置中的默认提供商）
             if not self.ai_engine:
+                from src.core.ai_engine import MultiAIEngine
                 try:
                     self.ai_engine = MultiAIEngine()
                 except ValueError as e:
                     return f"❌ AI配置错误: {str(e)}\n\n请在'AI设置'标签页配置API Key"
-            # 使用system prompt自动生成整理方案
-            ai_response = self.ai_engine.generate_organization_plan(system_prompt, self.current_files)
+            # 文件列表和整理规则都未变化时复用上次的方案，否则使用system prompt自动生成整理方案
+            cache_key = await asyncio.to_thread(self._plan_cache_key, system_prompt)
+            ai_response = self._plan_cache.get(cache_key)
+            cached = ai_response is not None
+            if cached:
+                self._plan_cache.move_to_end(cache_key)
+                logger.info("文件列表和整理规则未变化，复用已生成的整理方案")
+            else:
+                ai_response = await self.ai_engine.agenerate_organization_plan(system_prompt, self.current_files)
+                self._plan_cache[cache_key] = ai_response
+                while len(self._plan_cache) > PLAN_CACHE_SIZE:
+                    self._plan_cache.popitem(last=False)
             self.current_actions = ai_response.actions
             
             log_operation_complete("AI自动整理", f"生成 {len(self.current_actions)} 个操作")
             if not self.current_actions:
                 return "ℹ️ AI分析后认为文件已经整理得很好，无需调整"
             # 验证操作
-            validation_results = self.ai_engine.validate_actions(self.current_actions, self.current_files)
+            validation_results = self._validate_current_actions()
             # 统计验证结果
-            valid_actions = [r for r in validation_results if r["valid"]]
-            invalid_actions = [r for r in validation_results if not r["valid"]]
-            result = f"✅ AI整理方案生成完成！\n\n"
-            result += f"🤖 使用AI: {self.ai_engine.provider}\n"
-            result += f"📋 计划操作: {len(self.current_actions)} 项\n"
-            result += f"✅ 有效操作: {len(valid_actions)} 项\n"
-            if invalid_actions:
-                result += f"⚠️  无效操作: {len(invalid_actions)} 项\n"
-            result += f"\n📊 点击下方'查看整理方案'查看详情\n"
-            result += f"✅ 确认无误后点击'执行整理'开始整理文件"
-            return result
+            valid_count = sum(1 for r in validation_results if r["valid"])
+            invalid_count = len(validation_results) - valid_count
+            lines = [
+                "✅ AI整理方案生成完成！",
+                "",
+                f"🤖 使用AI: {self.ai_engine.provider}",
+                f"📋 计划操作: {len(self.current_actions)} 项",
+                f"✅ 有效操作: {valid_count} 项",
+            ]
+            if invalid_count:
+                lines.append(f"⚠️  无效操作: {invalid_count} 项")
+            if cached:
+                lines.append("♻️ 文件和整理规则都没有变化，已复用上次生成的方案（修改整理规则可重新生成）")
+            lines += ["", "📊 点击下方'查看整理方案'查看详情", "✅ 确认无误后点击'执行整理'开始整理文件"]
+            return "\n".join(lines)
         except Exception as e:
-            log_operation_error("AI自动整理", str(e))
+            log_operation_error("AI自动整理", str(e), exc_info=True)
             return f"❌ 整理失败: {str(e)}"
     
-    def _get_default_prompt(self) -> str:
+    def start_warmup(self) -> None:
+        """在后台线程中预先创建AI引擎（导入 SDK、创建客户端），首次点击整理时不必等待"""
+        if self._warmup_thread is None:
+            self._warmup_thread = threading.Thread(target=self._warm_ai_engine, name="freeu-ai-warmup", daemon=True)
+            self._warmup_thread.start()
+    
+    def _warm_ai_engine(self) -> None:
+        """创建AI引擎；尚未配置 API Key 等情况留到点击整理时再提示"""
+        if self.ai_engine:
+            return
+        try:
+            from src.core.ai_engine import MultiAIEngine
+            self.ai_engine = MultiAIEngine()
+        except Exception as e:
+            logger.debug("预先创建AI引擎失败: %s", e)
+    
+    async def _warm_ai_connection(self) -> None:
+        """页面首次加载时发起一次轻量请求（如列出模型），预先建立到AI提供商的连接
+        
+        异步客户端的连接池绑定事件循环，因此在服务端事件循环中进行，而不是在预热线程中。
+        """
+        if self._connection_warmed:
+            return
+        self._connection_warmed = True
+        if self._warmup_thread is not None:
+            await asyncio.to_thread(self._warmup_thread.join)
+        if not self.ai_engine:
+            return
+        try:
+            await self.ai_engine.aping()
+        except Exception as e:
+            logger.debug("预先连接AI提供商失败: %s", e)
+    
+    def _plan_cache_key(self, system_prompt: str) -> str:
+        """整理方案缓存的键：提供商、模型、是否本地归类、整理规则和文件列表（含大小、修改时间）的摘要"""
+        files = self.current_files
+        cached = self._files_digest
+        if cached is not None and cached[0] is files:
+            files_digest = cached[1]
+        else:
+            files_digest = hashlib.sha256(msgpack.encode(files)).hexdigest()
+            self._files_digest = (files, files_digest)
+        key = hashlib.sha256()
+        for part in (self.ai_engine.provider, getattr(self.ai_engine.adapter, "model", ""),
+                     config.local_classification, system_prompt, files_digest):
+            key.update(str(part).encode("utf-8"))
+            key.update(b"\0")
+        return key.hexdigest()
+    
+    @staticmethod
+    def _get_default_prompt() -> str:
         """获取默认整理提示词"""
-        return """你是一个专业的文件整理助手。请根据文件的类型、内容和用途，智能地将文件归类整理到合适的文件夹中。
-
-整理原则：
-1. 按文件类型分类（图片、文档、视频、音频、代码等）
-2. 按项目或主题归类（工作、学习、个人等）
-3. 按时间归档（如需要）
-4. 保持目录结构清晰，便于查找
-5. 相似或相关的文件放在一起
-6. 为每个文件夹取一个清晰易懂的名称
-
-请分析提供的文件列表，生成合理的整理方案。"""
+        return _DEFAULT_PROMPT
     
-    def get_actions_preview(self) -> List[List]:
-        """获取操作预览表格数据"""
+    def get_actions_preview(self) -> Union["pd.DataFrame", List[List]]:
+        """获取操作预览表格数据
+        
+        按列构建表格：安装了 pandas（gradio 的依赖）时返回 DataFrame，由 Gradio 直接按列序列化，
+        否则返回按行的列表。pandas 在第一次生成表格时才导入。
+        """
         if not self.current_actions:
             return []
         
-        # 验证操作
+        actions = self.current_actions
+        cached = self._preview_cache
+        if cached is not None and cached[0] is actions and cached[1] is self.current_files:
+            return cached[2]
+        
+        # 验证操作（紧接着 auto_organize 调用时直接复用其验证结果）
         if self.ai_engine:
-            validation_results = self.ai_engine.validate_actions(self.current_actions, self.current_files)
+            validation_results = self._validate_current_actions()
+            statuses = ["✅" if v["valid"] else "❌" for v in validation_results]
+            messages = [v.get("message", "") for v in validation_results]
         else:
-            validation_results = [{"valid": True, "message": ""} for _ in self.current_actions]
+            statuses = ["✅"] * len(actions)
+            messages = [""] * len(actions)
         
-        preview_data = []
-        for i, (action, validation) in enumerate(zip(self.current_actions, validation_results)):
-            status = "✅" if validation["valid"] else "❌"
-            preview_data.append([
-                status,
-                action.source,
-                action.destination,
-                action.reason,
-                action.action_type,
-                validation.get("message", "")
-            ])
+        columns = [
+            statuses,
+            [a.source for a in actions],
+            [a.destination for a in actions],
+            [a.reason for a in actions],
+            [a.action_type for a in actions],
+            messages,
+        ]
+        try:
+            import pandas as pd
+        except ImportError:
+            preview = [list(row) for row in zip(*columns)]
+        else:
+            preview = pd.DataFrame(dict(zip(PREVIEW_HEADERS, columns)))
+        self._preview_cache = (actions, self.current_files, preview)
+        return preview
+    
+    def _validate_current_actions(self) -> List[Dict]:
+        """验证当前操作列表，操作列表和文件列表都未替换时复用上次的结果"""
+        cached = self._last_validation
+        if cached is not None and cached[0] is self.current_actions and cached[1] is self.current_files:
+            return cached[2]
+        files = self.current_files
+        if self._file_names is None or self._file_names[0] is not files:
+            self._file_names = (files, self.ai_engine.build_file_name_index(files))
+        validation_results = self.ai_engine.validate_actions(self.current_actions, files, self._file_names[1])
+        self._last_validation = (self.current_actions, self.current_files, validation_results)
+        return validation_results
+    
+    async def execute_organization_plan(self, progress: Optional[Callable] = None) -> AsyncIterator[tuple]:
+        """执行整理方案，分段产出 (整理报告, 预览表格)
         
-        return preview_data
+        预览表格随报告一起更新，不再单独发起刷新请求；表格未变化时不重复发送。
+        progress 为 gr.Progress 时同时更新页面上的进度条。
+        """
+        import gradio as gr
+        shown = None
+        async with self._workspace():
+            async for report in self._iter_execution_report(progress):
+                preview = self.get_actions_preview()
+                unchanged = shown is not None and (preview is shown or len(preview) == len(shown) == 0)
+                yield report, (gr.update() if unchanged else preview)
+                shown = preview
     
-    def execute_organization_plan(self) -> str:
-        """执行整理方案并生成报告"""
+    async def _iter_execution_report(self, progress: Optional[Callable] = None) -> AsyncIterator[str]:
+        """执行整理方案并分段输出整理报告（文件移动在线程中进行）
+        
+        开始执行时先给出提示，之后每生成一段报告就产出一次当前内容。
+        """
         try:
             if not self.current_actions:
-                return "❌ 没有可执行的操作"
+                yield "❌ 没有可执行的操作"
+                return
             if not self.scanner:
-                return "❌ 扫描器未初始化"
+                yield "❌ 扫描器未初始化"
+                return
             log_operation_start("执行整理方案", {"action_count": len(self.current_actions)})
-            # 初始化执行器
-            if not self.executor:
+            yield f"⏳ 正在执行 {len(self.current_actions)} 个操作..."
+            # 初始化执行器（基础目录与当前扫描的目录不一致时重建）
+            if not self.executor or self.executor.base_path != self.scanner.base_path:
                 self.executor = FileExecutor(self.scanner.base_path)
-            # 执行操作
-            results = self.executor.execute_actions(self.current_actions, self.current_files)
-            # 统计结果
-            success_count = sum(1 for r in results if r["success"])
-            error_count = sum(1 for r in results if not r["success"])
-            log_operation_complete("执行整理方案", f"成功: {success_count}, 失败: {error_count}")
-            # 生成整理报告
-            report = self._generate_organization_report(results, success_count, error_count)
-            # 清空当前操作列表
+            # 执行操作：移动在线程中进行，每隔 PROGRESS_INTERVAL 秒推送一次进度
+            actions = self.current_actions
+            total = len(actions)
+            results: List[Optional[Dict]] = [None] * total
+            done = succeeded = 0
+            execution = self.executor.iter_execute_actions(actions, self.current_files)
+            try:
+                while True:
+                    batch = await asyncio.to_thread(_take_batch, execution)
+                    if not batch:
+                        break
+                    for i, r in batch:
+                        results[i] = r
+                        succeeded += r["success"]
+                    done += len(batch)
+                    if progress is not None:
+                        progress((done, total), desc="执行整理", unit="个文件")
+                    yield f"⏳ 正在执行整理... 进度: {done}/{total}，成功: {succeeded}"
+            finally:
+                # 提前结束时要等待已提交的移动完成，放到线程中，不阻塞事件循环
+                await asyncio.to_thread(execution.close)
+            # 统计结果：一次遍历同时得到成功数量、按目标文件夹的分组和失败列表
+            success_count = 0
+            folder_groups = defaultdict(list)
+            errors = []
+            for r in results:
+                if r["success"]:
+                    success_count += 1
+                    folder_groups[str(Path(r["destination"]).parent)].append(r)
+                else:
+                    errors.append(r)
+            log_operation_complete("执行整理方案", f"成功: {success_count}, 失败: {len(errors)}")
+            # 清空当前操作列表（先于报告输出，页面中途关闭也不会重复执行）
             self.current_actions = []
-            return report
+            self._last_validation = None
+            self._preview_cache = None
+            # 分段输出整理报告
+            report = ""
+            for section in self._iter_organization_report(success_count, folder_groups, errors):
+                report += section
+                yield report
         except Exception as e:
-            log_operation_error("执行整理方案", str(e))
-            return f"❌ 执行失败: {str(e)}"
+            log_operation_error("执行整理方案", str(e), exc_info=True)
+            yield f"❌ 执行失败: {str(e)}"
     
-    def _generate_organization_report(self, results: list, success_count: int, error_count: int) -> str:
-        """生成整理报告"""
-        report = f"# 📊 文件整理报告\n\n"
-        report += f"## 整理概况\n"
-        report += f"✅ 成功整理: {success_count} 个文件/文件夹\n"
-        if error_count > 0:
-            report += f"❌ 整理失败: {error_count} 个\n"
-        report += f"\n## 整理规则说明\n"
+    def _generate_organization_report(self, success_count: int, folder_groups: Dict[str, List[Dict]],
+                                      errors: List[Dict]) -> str:
+        """生成完整的整理报告"""
+        return "".join(self._iter_organization_report(success_count, folder_groups, errors))
+    
+    def _iter_organization_report(self, success_count: int, folder_groups: Dict[str, List[Dict]],
+                                  errors: List[Dict]) -> Iterator[str]:
+        """按段生成整理报告：概况、每个文件夹、查找说明、错误详情、结尾
+        
+        folder_groups 为按目标文件夹分组的成功结果，errors 为失败的结果，由调用方统计时一并得到。
+        """
+        parts = ["# 📊 文件整理报告\n\n", "## 整理概况\n", f"✅ 成功整理: {success_count} 个文件/文件夹\n"]
+        if errors:
+            parts.append(f"❌ 整理失败: {len(errors)} 个\n")
+        parts.append("\n## 整理规则说明\n")
         # 分析整理逻辑
-        folder_groups = {}
-        for r in results:
-            if r["success"]:
-                dest_folder = str(Path(r["destination"]).parent)
-                if dest_folder not in folder_groups:
-                    folder_groups[dest_folder] = []
-                folder_groups[dest_folder].append(r)
-        report += f"\n文件已按以下规则整理到 {len(folder_groups)} 个文件夹：\n\n"
-        for folder, items in sorted(folder_groups.items(), key=lambda x: len(x[1]), reverse=True)[:10]:
-            report += f"### 📁 {folder}\n"
-            report += f"- 包含 {len(items)} 个文件\n"
+        parts.append(f"\n文件已按以下规则整理到 {len(folder_groups)} 个文件夹：\n\n")
+        yield "".join(parts)
+        for folder, items in heapq.nlargest(10, folder_groups.items(), key=lambda x: len(x[1])):
+            parts = [f"### 📁 {folder}\n", f"- 包含 {len(items)} 个文件\n"]
             # 分析文件类型
-            extensions = {}
-            for item in items:
-                ext = Path(item["source"]).suffix or "无扩展名"
-                extensions[ext] = extensions.get(ext, 0) + 1
+            extensions = Counter(Path(item["source"]).suffix or "无扩展名" for item in items)
             if extensions:
-                report += f"- 文件类型: {', '.join([f'{ext}({count})' for ext, count in sorted(extensions.items(), key=lambda x: x[1], reverse=True)[:5]])}\n"
-            report += f"\n"
-        report += f"\n## 如何查找文件\n\n"
-        report += f"1. **按文件类型查找**: 文件已按类型归类到相应文件夹\n"
-        report += f"2. **按项目主题查找**: 相关文件已归类到同一文件夹\n"
-        report += f"3. **使用系统搜索**: 在整理后的文件夹中搜索更高效\n"
-        if error_count > 0:
-            report += f"\n## ⚠️ 错误详情\n\n"
-            for r in results:
-                if not r["success"]:
-                    report += f"- ❌ {r['source']}: {r.get('error', '未知错误')}\n"
-        report += f"\n---\n"
-        report += f"整理完成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
-        return report
+                parts.append(f"- 文件类型: {', '.join([f'{ext}({count})' for ext, count in extensions.most_common(5)])}\n")
+            parts.append("\n")
+            yield "".join(parts)
+        yield "".join([
+            "\n## 如何查找文件\n\n",
+            "1. **按文件类型查找**: 文件已按类型归类到相应文件夹\n",
+            "2. **按项目主题查找**: 相关文件已归类到同一文件夹\n",
+            "3. **使用系统搜索**: 在整理后的文件夹中搜索更高效\n",
+        ])
+        if errors:
+            yield "\n## ⚠️ 错误详情\n\n" + "".join(
+                f"- ❌ {r['source']}: {r.get('error', '未知错误')}\n" for r in errors
+            )
+        yield f"\n---\n整理完成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
     
     def get_available_ai_providers(self) -> List[str]:
         """获取可用的AI提供商列表"""
         try:
-            if not self.ai_engine:
-                # 临时创建AI引擎来获取可用提供商
-                temp_engine = MultiAIEngine()
-                providers = temp_engine.get_available_providers()
-            else:
-                providers = self.ai_engine.get_available_providers()
+            # 直接读取配置，不需要为此创建AI引擎
+            from src.core.ai_engine import MultiAIEngine
+            providers = MultiAIEngine.list_providers()
             
             return providers if providers else ["claude"]  # 默认返回claude
-        except:
+        except Exception as e:
+            logger.warning("获取可用AI提供商失败: %s", e)
             return ["claude"]  # 出错时返回默认
     
+    def _invalidate_config_display(self) -> None:
+        """配置已修改，下次获取配置显示信息时重新生成"""
+        self._config_version += 1
+    
     def get_ai_config_display(self) -> str:
-        """获取AI配置显示信息"""
+        """获取AI配置显示信息（配置未修改时返回缓存的文本）"""
+        if self._config_display_version == self._config_version:
+            return self._config_display_cache
         try:
             providers_config = config._config.get('ai_providers', {})
             current_provider = config.ai_provider
             
-            config_info = f"当前AI提供商: {current_provider}\n\n"
-            config_info += "已配置的AI提供商:\n"
-            
+            lines = [f"当前AI提供商: {current_provider}", "", "已配置的AI提供商:"]
             for provider, provider_config in providers_config.items():
                 api_key_status = "✅ 已配置" if provider_config.get('api_key') else "❌ 未配置"
                 model = provider_config.get('model', '默认模型')
                 enabled = "✅ 启用" if provider_config.get('enabled', False) else "❌ 禁用"
-                
-                config_info += f"\n{provider}:\n"
-                config_info += f"  - API Key: {api_key_status}\n"
-                config_info += f"  - 模型: {model}\n"
-                config_info += f"  - 状态: {enabled}\n"
+                lines += [
+                    "",
+                    f"{provider}:",
+                    f"  - API Key: {api_key_status}",
+                    f"  - 模型: {model}",
+                    f"  - 状态: {enabled}",
+                ]
             
-            return config_info
+            self._config_display_cache = "\n".join(lines) + "\n"
+            self._config_display_version = self._config_version
+            return self._config_display_cache
             
         except Exception as e:
             return f"获取配置信息失败: {str(e)}"
@@ -270,7 +603,8 @@ class FreeUInterface:
             
             # 保存配置
             config._config['ai_providers'] = providers_config
-            config.save_config()
+            config.mark_dirty()
+            self._invalidate_config_display()
             
             logger.info(f"AI提供商配置已更新: {provider}")
             return f"✅ AI提供商 {provider} 配置已更新！"
@@ -296,6 +630,7 @@ class FreeUInterface:
         """设置默认AI提供商"""
         try:
             config.ai_provider = provider
+            self._invalidate_config_display()
             logger.info(f"默认AI提供商已设置为: {provider}")
             # 如果AI引擎已初始化，也切换一下
             if self.ai_engine:
@@ -309,7 +644,8 @@ class FreeUInterface:
         """保存整理规则prompt"""
         try:
             config._config['organization_prompt'] = prompt
-            config.save_config()
+            config.mark_dirty()
+            self._invalidate_config_display()
             logger.info("整理规则已更新")
             return f"✅ 整理规则已保存！共{len(prompt)}字符"
         except Exception as e:
@@ -321,38 +657,27 @@ class FreeUInterface:
         default_prompt = self._get_default_prompt()
         try:
             config._config['organization_prompt'] = default_prompt
-            config.save_config()
+            config.mark_dirty()
+            self._invalidate_config_display()
             logger.info("整理规则已重置为默认")
             return default_prompt, "✅ 已恢复默认整理规则"
         except Exception as e:
             logger.error(f"重置整理规则失败: {e}")
             return default_prompt, f"❌ 重置失败: {str(e)}"
     
-    def _format_file_size(self, size: int) -> str:
-        """格式化文件大小"""
-        for unit in ['B', 'KB', 'MB', 'GB']:
-            if size < 1024.0:
-                return f"{size:.1f} {unit}"
-            size /= 1024.0
-        return f"{size:.1f} TB"
+    _format_file_size = staticmethod(format_file_size)
     
     def get_common_directory(self, dir_name: str) -> str:
         """获取常用目录路径"""
-        home = str(Path.home())
-        common_dirs = {
-            "desktop": Path.home() / "Desktop",
-            "documents": Path.home() / "Documents",
-            "downloads": Path.home() / "Downloads",
-            "pictures": Path.home() / "Pictures",
-            "home": Path.home()
-        }
-        dir_path = common_dirs.get(dir_name.lower(), Path.home())
-        if dir_path.exists():
-            return str(dir_path)
-        return home
+        dir_path = str(_COMMON_DIRS.get(dir_name.lower(), _HOME))
+        if _dir_exists(dir_path):
+            return dir_path
+        return _HOME_STR
     
-    def create_interface(self) -> gr.Blocks:
+    def create_interface(self) -> "gr.Blocks":
         """创建Gradio界面"""
+        import gradio as gr
+        
         with gr.Blocks(title="FreeU - AI文件整理助手", theme=gr.themes.Soft()) as interface:
             gr.Markdown("# 🎯 FreeU - AI文件整理助手")
             gr.Markdown("通过自然语言指令，让AI帮你整理本地文件")
@@ -404,71 +729,69 @@ class FreeUInterface:
                         # 方案预览
                         gr.Markdown("### 📋 整理方案预览")
                         preview_table = gr.Dataframe(
-                            headers=["状态", "源文件", "目标路径", "原因", "操作", "备注"],
+                            headers=PREVIEW_HEADERS,
                             label="操作预览",
                             interactive=False,
                             wrap=True
                         )
                 
-                # 事件绑定 - 快捷文件夹按钮
+                # 事件绑定 - 快捷文件夹按钮（只返回路径字符串，不经过队列直接处理）
                 desktop_btn.click(
                     fn=lambda: self.get_common_directory("desktop"),
-                    outputs=directory_input
+                    outputs=directory_input,
+                    queue=False
                 )
                 documents_btn.click(
                     fn=lambda: self.get_common_directory("documents"),
-                    outputs=directory_input
+                    outputs=directory_input,
+                    queue=False
                 )
                 downloads_btn.click(
                     fn=lambda: self.get_common_directory("downloads"),
-                    outputs=directory_input
+                    outputs=directory_input,
+                    queue=False
                 )
                 pictures_btn.click(
                     fn=lambda: self.get_common_directory("pictures"),
-                    outputs=directory_input
+                    outputs=directory_input,
+                    queue=False
                 )
                 home_btn.click(
                     fn=lambda: self.get_common_directory("home"),
-                    outputs=directory_input
+                    outputs=directory_input,
+                    queue=False
                 )
+                # 进度条：Gradio 按参数默认值识别 gr.Progress，由页面通过已有的队列连接接收推送，无需轮询
+                async def scan_with_progress(directory_path, progress=gr.Progress()):
+                    async for update in self.scan_directory(directory_path, progress):
+                        yield update
+                
+                async def execute_with_progress(progress=gr.Progress()):
+                    async for update in self.execute_organization_plan(progress):
+                        yield update
+                
                 scan_btn.click(
-                    fn=self.scan_directory,
+                    fn=scan_with_progress,
                     inputs=[directory_input],
-                    outputs=scan_output
+                    outputs=scan_output,
+                    **_concurrency(WORKSPACE_CONCURRENCY, "workspace")
                 )
                 auto_organize_btn.click(
                     fn=self.auto_organize,
-                    outputs=organize_output
-                ).then(
-                    fn=self.get_actions_preview,
-                    outputs=preview_table
+                    outputs=[organize_output, preview_table],
+                    **_concurrency(WORKSPACE_CONCURRENCY, "workspace")
                 )
                 refresh_preview_btn.click(
                     fn=self.get_actions_preview,
                     outputs=preview_table
                 )
                 execute_btn.click(
-                    fn=self.execute_organization_plan,
-                    outputs=report_output
-                ).then(
-                    fn=self.get_actions_preview,
-                    outputs=preview_table
+                    fn=execute_with_progress,
+                    outputs=[report_output, preview_table],
+                    **_concurrency(WORKSPACE_CONCURRENCY, "workspace")
                 )
                 
-                gr.Markdown("""
-                ### 📖 使用说明
-                1. **选择目录**: 点击快捷按钮或输入要整理的目录路径，点击"扫描目录"（自动递归扫描所有文件）
-                2. **AI整理**: 点击"开始智能整理"，AI将根据预设规则自动生成整理方案
-                3. **预览方案**: 在右侧预览表格中查看详细的整理操作
-                4. **执行整理**: 确认无误后点击"执行整理"，完成后查看详细报告
-                
-                ### ⚠️ 注意事项
-                - AI整理规则可在'AI设置'中自定义
-                - 只执行移动操作，不会删除文件
-                - 自动跳过隐藏文件和系统文件
-                - 首次使用需要在'AI设置'中配置API Key
-                - 建议先备份重要文件
-                """)
+                gr.Markdown(_USAGE_MD)
             
             with gr.Tab("AI设置"):
                 gr.Markdown("## 🔧 AI提供商配置")
@@ -511,7 +834,7 @@ class FreeUInterface:
                         gr.Markdown("自定义AI整理文件的规则和原则")
                         organization_prompt = gr.Textbox(
                             label="System Prompt（整理规则）",
-                            value=config._config.get('organization_prompt', FreeUInterface()._get_default_prompt()),
+                            value=config._config.get('organization_prompt', self._get_default_prompt()),
                             lines=12,
                             placeholder="输入AI整理文件的规则...",
                             info="AI将根据这些规则自动整理文件"
@@ -527,7 +850,7 @@ class FreeUInterface:
                         # 默认AI提供商选择
                         gr.Markdown("### 🎯 默认AI提供商")
                         default_provider_dropdown = gr.Dropdown(
-                            choices=["claude", "openai", "kimi", "glm", "openrouter"],
+                            choices=_PROVIDER_CHOICES,
                             value=config.ai_provider,
                             label="默认AI提供商",
                             info="整理文件时使用的AI服务"
@@ -541,7 +864,7 @@ class FreeUInterface:
                         # 配置表单
                         gr.Markdown("### 📝 配置AI提供商")
                         provider_select = gr.Dropdown(
-                            choices=["claude", "openai", "kimi", "glm", "openrouter"],
+                            choices=_PROVIDER_CHOICES,
                             value="claude",
                             label="选择AI提供商"
                         )
@@ -579,20 +902,7 @@ class FreeUInterface:
                             interactive=False
                         )
                 
-                gr.Markdown("""
-                ### 🔑 获取API Key
-                - **Claude**: [Anthropic Console](https://console.anthropic.com/)
-                - **OpenAI**: [OpenAI API Keys](https://platform.openai.com/api-keys)
-                - **Kimi**: [Moonshot AI](https://platform.moonshot.cn/)
-                - **GLM**: [Zhipu AI](https://open.bigmodel.cn/)
-                - **OpenRouter**: [OpenRouter](https://openrouter.ai/keys)
-                
-                ### 💡 使用建议
-                1. 建议配置多个AI提供商作为备用
-                2. 不同提供商的模型能力各有特色
-                3. 可以根据任务复杂度选择不同的提供商
-                4. API Key请妥善保管，不要分享给他人
-                """)
+                gr.Markdown(_AI_SETTINGS_MD)
                 
                 # AI设置页面的事件绑定
                 refresh_config_btn.click(
@@ -643,6 +953,9 @@ class FreeUInterface:
                     outputs=config_display
                 )
             
+            # 页面加载时预先建立到AI提供商的连接
+            interface.load(fn=self._warm_ai_connection)
+            
         return interface
     
     def save_scan_settings(self, scan_all_files: bool, max_files: int) -> str:
@@ -650,7 +963,8 @@ class FreeUInterface:
         try:
             config._config['scan_all_files'] = scan_all_files
             config._config['max_files'] = max(max_files, 100)  # 最少100个文件
-            config.save_config()
+            config.mark_dirty()
+            self._invalidate_config_display()
             
             logger.info(f"扫描设置已更新: scan_all_files={scan_all_files}, max_files={max_files}")
             return f"✅ 扫描设置已保存！\n- 扫描所有文件: {'是' if scan_all_files else '否'}\n- 最大文件数量: {max_files}"
@@ -659,29 +973,28 @@ class FreeUInterface:
             logger.error(f"保存扫描设置失败: {e}")
             return f"❌ 保存扫描设置失败: {str(e)}"
     
-    def _test_ai_connection(self, provider: str) -> str:
+    async def _test_ai_connection(self, provider: str) -> str:
         """测试AI连接"""
         try:
-            # 创建临时引擎测试连接
-            test_engine = MultiAIEngine(provider)
-            
-            # 简单的测试请求
-            test_files = [
-                FileInfo(name="test.txt", path="/tmp/test.txt", size=100, 
-                      modified_time="2024-01-01 00:00:00", is_directory=False)
-            ]
-            
-            result = test_engine.generate_organization_plan("测试连接", test_files)
-            return f"✅ AI提供商 {provider} 连接测试成功！"
+            # 使用该提供商自己的配置，只做轻量的连通性请求（如列出模型），不生成整理方案、不消耗token
+            from src.core.ai_engine import MultiAIEngine
+            latency_ms = await MultiAIEngine.aping_provider(provider)
+            return f"✅ AI提供商 {provider} 连接测试成功！（{latency_ms:.0f}ms）"
             
         except Exception as e:
             return f"❌ AI提供商 {provider} 连接测试失败: {str(e)}"
 
 
 def create_app():
-    """创建应用"""
+    """创建应用（已启用请求队列，启动时应传入 max_threads=LAUNCH_MAX_THREADS）"""
     interface = FreeUInterface()
-    return interface.create_interface()
+    interface.start_warmup()
+    app = interface.create_interface()
+    if _is_gradio_4():
+        app.queue(default_concurrency_limit=QUEUE_CONCURRENCY, max_size=QUEUE_MAX_SIZE, api_open=False)
+    else:
+        app.queue(concurrency_count=QUEUE_CONCURRENCY, max_size=QUEUE_MAX_SIZE, api_open=False)
+    return app
 
 if __name__ == "__main__":
     app = create_app()
@@ -689,5 +1002,6 @@ if __name__ == "__main__":
         server_name="127.0.0.1",
         server_port=7861,
         share=False,
-        show_error=True
+        show_error=True,
+        max_threads=LAUNCH_MAX_THREADS
     )
\ No newline at end of file
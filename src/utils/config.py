@@ -1,42 +1,157 @@
 import os
 import json
+import atexit
 import logging
+import threading
 from pathlib import Path
 from typing import Optional
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
 class Config:
+    # 实例属性固定，用 __slots__ 省去每个实例的 __dict__
+    __slots__ = (
+        'config_dir', 'config_file', '_data', '_reload_hooks', '_save_lock',
+        '_save_timer', '_last_saved', '_excluded_resolved',
+    )
+    
+    # mark_dirty 之后延迟写盘的秒数，期间的多次修改合并为一次写入
+    SAVE_DELAY = 0.5
+    # 配置目录在类定义时确定一次，创建实例时不再调用 Path.home()
+    _CONFIG_DIR = Path.home() / '.freeu'
+    _CONFIG_FILE = _CONFIG_DIR / 'config.json'
+    
     def __init__(self):
-        self.config_dir = Path.home() / '.freeu'
-        self.config_file = self.config_dir / 'config.json'
-        self._config = {}
-        self.load_config()
+        self.config_dir = self._CONFIG_DIR
+        self.config_file = self._CONFIG_FILE
+        # 配置内容在第一次访问时才读取，只导入模块而不读配置的命令不必读文件
+        self._data: Optional[dict] = None
+        self._reload_hooks = []
+        self._save_lock = threading.Lock()
+        self._save_timer: Optional[threading.Timer] = None
+        # 最近一次读取或写入配置文件时的内容，内容未变化时 save_config 不再写盘
+        self._last_saved: Optional[bytes] = None
+        # (排除路径列表, 解析后的前缀元组)，排除路径未修改时直接复用
+        self._excluded_resolved: Optional[tuple] = None
+        # 进程退出前写入尚未保存的修改
+        atexit.register(self.flush)
     
     def load_config(self) -> None:
         """加载配置文件"""
         try:
-            if self.config_file.exists():
-                with open(self.config_file, 'r', encoding='utf-8') as f:
-                    self._config = json.load(f)
-                    logger.info(f"配置文件加载成功: {self.config_file}")
-            else:
-                logger.info("配置文件不存在，使用默认配置")
-                self._config = self.get_default_config()
+            # 直接读取，文件不存在时由异常判断，省去一次 exists() 的 stat
+            data = self.config_file.read_bytes()
+            self._config = orjson.loads(data) if orjson is not None else json.loads(data)
+            logger.info(f"配置文件加载成功: {self.config_file}")
+            self._last_saved = self._serialize()
+        except FileNotFoundError:
+            logger.info("配置文件不存在，使用默认配置")
+            self._config = self.get_default_config()
+            self._last_saved = None
         except Exception as e:
             logger.error(f"配置文件加载失败: {e}")
             self._config = self.get_default_config()
+            self._last_saved = None
+    
+    @property
+    def _config(self) -> dict:
+        """配置内容，第一次访问时加载配置文件"""
+        if self._data is None:
+            self.load_config()
+        return self._data
+    
+    @_config.setter
+    def _config(self, value: dict) -> None:
+        self._data = value
+    
+    def reload(self) -> None:
+        """重新加载配置文件，并通知依赖配置缓存的模块刷新"""
+        self.load_config()
+        for hook in self._reload_hooks:
+            hook()
+    
+    def add_reload_hook(self, hook) -> None:
+        """注册配置重新加载后的回调"""
+        self._reload_hooks.append(hook)
     
     def save_config(self) -> None:
-        """保存配置文件"""
+        """保存配置文件
+        
+        先写入同目录下的临时文件再 os.replace 替换，写入中途出错也不会留下不完整的配置文件。
+        内容一次 os.write 写入，不经过 Python 文件对象的缓冲层。
+        内容与上次读取或写入时相同则直接返回，不重复写盘。
+        """
+        with self._save_lock:
+            self._cancel_pending_save()
+            payload = self._serialize()
+            if payload == self._last_saved:
+                logger.debug("配置未变化，跳过保存")
+                return
+            tmp_file = self.config_file.with_suffix('.tmp')
+            try:
+                try:
+                    self._write_file(tmp_file, payload)
+                except FileNotFoundError:
+                    # 配置目录还不存在（通常只有第一次保存），创建后重试
+                    self.config_dir.mkdir(parents=True, exist_ok=True)
+                    self._write_file(tmp_file, payload)
+                os.replace(tmp_file, self.config_file)
+                self._last_saved = payload
+                logger.info(f"配置文件保存成功: {self.config_file}")
+            except Exception as e:
+                logger.error(f"配置文件保存失败: {e}")
+                raise
+    
+    @staticmethod
+    def _write_file(path: Path, payload: bytes) -> None:
+        """用 os.write 直接写入整个文件，权限 0600（配置中含 API Key）"""
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
         try:
-            self.config_dir.mkdir(parents=True, exist_ok=True)
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(self._config, f, indent=2, ensure_ascii=False)
-            logger.info(f"配置文件保存成功: {self.config_file}")
-        except Exception as e:
-            logger.error(f"配置文件保存失败: {e}")
-            raise
+            view = memoryview(payload)
+            while view:
+                view = view[os.write(fd, view):]
+        finally:
+            os.close(fd)
+    
+    def _serialize(self) -> bytes:
+        """配置文件的内容（UTF-8，缩进 2 格）；安装了 orjson 时用它序列化"""
+        if orjson is not None:
+            return orjson.dumps(self._config, option=orjson.OPT_INDENT_2)
+        return json.dumps(self._config, indent=2, ensure_ascii=False).encode('utf-8')
+    
+    def mark_dirty(self) -> None:
+        """标记配置已修改，SAVE_DELAY 秒内没有新的修改时再写盘
+        
+        界面上连续修改多项设置时只写一次文件；进程退出时会立即写入尚未保存的修改。
+        """
+        with self._save_lock:
+            self._cancel_pending_save()
+            self._save_timer = threading.Timer(self.SAVE_DELAY, self._save_in_background)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+    
+    def flush(self) -> None:
+        """立即写入 mark_dirty 之后尚未保存的修改"""
+        if self._save_timer is not None:
+            self.save_config()
+    
+    def _save_in_background(self) -> None:
+        """延迟写盘的定时器回调，失败只记录日志"""
+        try:
+            self.save_config()
+        except Exception:
+            pass
+    
+    def _cancel_pending_save(self) -> None:
+        """取消尚未触发的延迟写盘（调用方需持有 _save_lock）"""
+        if self._save_timer is not None:
+            self._save_timer.cancel()
+            self._save_timer = None
     
     def get_default_config(self) -> dict:
         """获取默认配置"""
@@ -72,6 +187,9 @@ class Config:
             'log_level': 'INFO',
             'max_files': 10000,  # 增加文件数量限制到10000
             'scan_all_files': False,  # 是否扫描所有文件（无限制）
+            'local_classification': False,  # 是否先按扩展名本地归类，只把无法确定的文件交给AI
+            'scan_cache': False,  # 目录未变化时复用上次的扫描结果（~/.freeu/scan_cache.db）；只检查目录修改时间，原地修改过的文件大小和时间可能是旧值
+            'statx_dont_sync': False,  # 扫描网络文件系统时用 statx(AT_STATX_DONT_SYNC) 读取缓存的文件属性（仅 Linux）
             'allowed_operations': ['move'],
             'excluded_paths': [
                 '/System',
@@ -94,7 +212,7 @@ class Config:
     def ai_provider(self, value: str) -> None:
         """设置当前AI提供商"""
         self._config['ai_provider'] = value
-        self.save_config()
+        self.mark_dirty()
     
     def get_ai_provider_config(self, provider: str = None) -> dict:
         """获取AI提供商配置"""
@@ -172,6 +290,11 @@ class Config:
         """获取最大文件数量限制"""
         return self._config.get('max_files', 1000)
     
+    @property
+    def local_classification(self) -> bool:
+        """是否先按扩展名本地归类"""
+        return self._config.get('local_classification', False)
+    
     @property
     def allowed_operations(self) -> list:
         """获取允许的操作类型"""
@@ -181,6 +304,36 @@ class Config:
     def excluded_paths(self) -> list:
         """获取排除路径列表"""
         return self._config.get('excluded_paths', [])
+    
+    @property
+    def resolved_excluded_paths(self) -> tuple:
+        """排除路径展开 ~ 并解析符号链接后的前缀元组，每项都以分隔符结尾
+        
+        扫描器和执行器只需做字符串前缀比较；结果缓存到排除路径列表被修改为止。
+        结尾补分隔符，避免 /home/a 误匹配 /home/alice。
+        """
+        paths = tuple(self.excluded_paths)
+        cached = self._excluded_resolved
+        if cached is not None and cached[0] == paths:
+            return cached[1]
+        prefixes = []
+        for path in paths:
+            try:
+                prefixes.append(os.path.realpath(os.path.expanduser(path)).rstrip(os.sep) + os.sep)
+            except (OSError, TypeError, ValueError) as e:
+                # 无法解析的排除路径跳过
+                logger.warning(f"无法解析排除路径: {path} - {e}")
+        self._excluded_resolved = (paths, tuple(prefixes))
+        return self._excluded_resolved[1]
+
+_config_lock = threading.Lock()
 
-# 全局配置实例
-config = Config()
\ No newline at end of file
+def __getattr__(name: str):
+    """全局配置实例 config 在第一次被访问时才创建（PEP 562 模块 __getattr__）"""
+    global config
+    if name == 'config':
+        with _config_lock:
+            if 'config' not in globals():
+                config = Config()
+        return config
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
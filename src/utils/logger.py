@@ -1,72 +1,151 @@
 import logging
 import sys
+import time
+import threading
 from pathlib import Path
-from datetime import datetime
 from src.utils.config import config
 
+# 日志格式
+LOG_FORMAT = '[%(asctime)s] [%(levelname)s] [%(name)s] %(message)s'
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# 日志文件的写缓冲大小
+LOG_BUFFER_SIZE = 64 * 1024
+
+# log_* 辅助函数共用的日志记录器，避免每次调用都经 getLogger 加锁查表
+_LOGGER = logging.getLogger('freeu')
+
+class BufferedFileHandler(logging.FileHandler):
+    """带写缓冲的日志文件处理器
+    
+    FileHandler 每条记录都会 flush 一次，大量进度日志时每行一次 write 系统调用。
+    这里写入 64 KiB 缓冲，缓冲满、遇到 WARNING 及以上级别或关闭时立即落盘；
+    其余日志由后台线程每隔 flush_interval 秒检查一次并落盘，空闲时最多滞后约 1 秒。
+    logging.shutdown 只在正常退出时运行；被 SIGTERM 结束时由 main 中的信号处理调用 flush_logging()。
+    """
+    
+    flush_level = logging.WARNING
+    flush_interval = 1.0
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._dirty = False
+        self._closed = threading.Event()
+        threading.Thread(target=self._flush_periodically, name="log-flush", daemon=True).start()
+    
+    def _open(self):
+        return open(self.baseFilename, self.mode, encoding=self.encoding,
+                    errors=self.errors, buffering=LOG_BUFFER_SIZE)
+    
+    def emit(self, record: logging.LogRecord) -> None:
+        if self.stream is None:
+            self.stream = self._open()
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+            self._dirty = True
+            if record.levelno >= self.flush_level:
+                self.flush()
+        except Exception:
+            self.handleError(record)
+    
+    def flush(self) -> None:
+        self._dirty = False
+        super().flush()
+    
+    def close(self) -> None:
+        self._closed.set()
+        super().close()
+    
+    def _flush_periodically(self) -> None:
+        """后台线程：缓冲中有未落盘的日志时每隔 flush_interval 秒写出一次"""
+        while not self._closed.wait(self.flush_interval):
+            if self._dirty:
+                try:
+                    self.flush()
+                except Exception:
+                    pass
+
+def flush_logging() -> None:
+    """立即写出根日志记录器各处理器缓冲中的日志（进程被信号结束前调用）"""
+    for handler in logging.getLogger().handlers:
+        try:
+            handler.flush()
+        except Exception:
+            pass
+
 def setup_logging() -> logging.Logger:
     """设置日志系统"""
     # 创建logs目录
     log_dir = Path('logs')
     log_dir.mkdir(exist_ok=True)
     
-    # 配置日志格式
-    log_format = '[%(asctime)s] [%(levelname)s] [%(name)s] %(message)s'
-    date_format = '%Y-%m-%d %H:%M:%S'
+    # 控制台和文件处理器共用同一个格式化器
+    formatter = logging.Formatter(LOG_FORMAT, DATE_FORMAT)
     
     # 设置根日志记录器
     root_logger = logging.getLogger()
     root_logger.setLevel(getattr(logging, config.log_level))
     
-    # 清除现有的处理器
+    # 清除现有的处理器，先关闭以写出文件处理器缓冲中的日志
+    for handler in root_logger.handlers:
+        handler.close()
     root_logger.handlers.clear()
     
     # 创建控制台处理器
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(logging.INFO)
-    console_formatter = logging.Formatter(log_format, date_format)
-    console_handler.setFormatter(console_formatter)
+    console_handler.setFormatter(formatter)
     root_logger.addHandler(console_handler)
     
     # 创建文件处理器
-    log_file = log_dir / f'freeu_{datetime.now().strftime("%Y%m%d")}.log'
-    file_handler = logging.FileHandler(log_file, encoding='utf-8')
+    log_file = log_dir / f'freeu_{time.strftime("%Y%m%d")}.log'
+    file_handler = BufferedFileHandler(log_file, encoding='utf-8')
     file_handler.setLevel(logging.DEBUG)
-    file_formatter = logging.Formatter(log_format, date_format)
-    file_handler.setFormatter(file_formatter)
+    file_handler.setFormatter(formatter)
     root_logger.addHandler(file_handler)
     
     # 创建专门的FreeU日志记录器
     logger = logging.getLogger('freeu')
     logger.info("FreeU日志系统初始化完成")
-    logger.info(f"日志文件: {log_file}")
+    logger.info("日志文件: %s", log_file)
     
     return logger
 
+class _TagAdapter(logging.LoggerAdapter):
+    """在消息前加上 [开始]、[完成] 等标签；记录被级别过滤时不做任何格式化"""
+    
+    def process(self, msg, kwargs):
+        return f"{self.extra['tag']} {msg}", kwargs
+
+_START = _TagAdapter(_LOGGER, {'tag': '[开始]'})
+_COMPLETE = _TagAdapter(_LOGGER, {'tag': '[完成]'})
+_ERROR = _TagAdapter(_LOGGER, {'tag': '[错误]'})
+_WARNING = _TagAdapter(_LOGGER, {'tag': '[警告]'})
+
 def log_operation_start(operation: str, details: dict = None) -> None:
     """记录操作开始"""
-    logger = logging.getLogger('freeu')
-    details_str = f" - {details}" if details else ""
-    logger.info(f"[开始] {operation}{details_str}")
+    _START.info("%s%s", operation, f" - {details}" if details else "")
 
 def log_operation_complete(operation: str, result: str = None) -> None:
     """记录操作完成"""
-    logger = logging.getLogger('freeu')
-    result_str = f" - {result}" if result else ""
-    logger.info(f"[完成] {operation}{result_str}")
+    _COMPLETE.info("%s%s", operation, f" - {result}" if result else "")
 
-def log_operation_error(operation: str, error: str) -> None:
-    """记录操作错误"""
-    logger = logging.getLogger('freeu')
-    logger.error(f"[错误] {operation} - {error}")
+def log_operation_error(operation: str, error: str, exc_info: bool = False) -> None:
+    """记录操作错误，exc_info=True 时附带当前异常的堆栈"""
+    _ERROR.error("%s - %s", operation, error, exc_info=exc_info)
 
 def log_operation_warning(operation: str, warning: str) -> None:
     """记录操作警告"""
-    logger = logging.getLogger('freeu')
-    logger.warning(f"[警告] {operation} - {warning}")
+    _WARNING.warning("%s - %s", operation, warning)
 
 def log_progress(current: int, total: int, operation: str = "处理进度") -> None:
-    """记录进度信息"""
-    logger = logging.getLogger('freeu')
-    percentage = (current / total * 100) if total > 0 else 0
-    logger.info(f"[进度] {operation}: {current}/{total} ({percentage:.1f}%)")
\ No newline at end of file
+    """记录进度信息
+    
+    每完成约 1% 记录一行（加上最后一项），大批量操作最多约 100 行进度日志。
+    """
+    if total > 0 and current != total and current % max(1, total // 100):
+        return
+    if not _LOGGER.isEnabledFor(logging.INFO):
+        return
+    percentage = current * 100 // total if total > 0 else 0
+    _LOGGER.info("[进度] %s: %d/%d (%d%%)", operation, current, total, percentage)
\ No newline at end of file
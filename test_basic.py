@@ -5,6 +5,9 @@ FreeU简单测试 - 验证基础功能
 
 import sys
 import os
+import shutil
+import logging
+import unittest
 from pathlib import Path
 
 # 将src目录添加到Python路径
@@ -12,71 +15,55 @@ current_dir = Path(__file__).parent
 src_dir = current_dir / 'src'
 sys.path.insert(0, str(src_dir))
 
-def test_basic_imports():
-    """测试基础导入"""
-    print("🧪 测试基础导入...")
-    
-    try:
-        from src.utils.config import Config
-        print("✅ 配置模块导入成功")
-        
-        from src.utils.logger import setup_logging
-        print("✅ 日志模块导入成功")
-        
-        from src.core.scanner import DirectoryScanner, FileInfo
-        print("✅ 扫描器模块导入成功")
-        
-        return True
-        
-    except Exception as e:
-        print(f"❌ 导入失败: {e}")
-        return False
+from src.utils.config import Config, config
+from src.utils.logger import BufferedFileHandler, setup_logging, log_operation_start, log_operation_complete
+from src.core.scanner import DirectoryScanner, FileInfo
 
-def test_config():
-    """测试配置"""
-    print("⚙️  测试配置模块...")
+class BasicTests(unittest.TestCase):
+    """基础功能测试，日志系统在整个类中只初始化一次"""
     
-    try:
-        from src.utils.config import config
-        print(f"✅ 配置初始化成功")
+    @classmethod
+    def setUpClass(cls):
+        cls.logger = setup_logging()
+    
+    def test_basic_imports(self):
+        """测试基础导入"""
+        print("🧪 测试基础导入...")
+        self.assertTrue(callable(Config))
+        self.assertTrue(callable(setup_logging))
+        self.assertTrue(callable(DirectoryScanner))
+        self.assertTrue(callable(FileInfo))
+        print("✅ 配置、日志、扫描器模块导入成功")
+    
+    def test_config(self):
+        """测试配置"""
+        print("⚙️  测试配置模块...")
         print(f"   日志级别: {config.log_level}")
         print(f"   最大文件数: {config.max_files}")
-        return True
-        
-    except Exception as e:
-        print(f"❌ 配置测试失败: {e}")
-        return False
-
-def test_logging():
-    """测试日志"""
-    print("📝 测试日志模块...")
+        self.assertTrue(config.log_level)
+        self.assertGreater(config.max_files, 0)
+        print("✅ 配置初始化成功")
     
-    try:
-        from src.utils.logger import setup_logging, log_operation_start, log_operation_complete
-        
-        logger = setup_logging()
+    def test_logging(self):
+        """测试日志"""
+        print("📝 测试日志模块...")
+        # 日志文件处理器只注册了一个（pytest 运行时还会附加它自己的处理器）
+        file_handlers = [h for h in logging.getLogger().handlers if isinstance(h, BufferedFileHandler)]
+        self.assertEqual(len(file_handlers), 1)
         print("✅ 日志系统初始化成功")
         
         log_operation_start("测试操作")
         log_operation_complete("测试操作", "成功")
         print("✅ 日志记录功能正常")
-        
-        return True
-        
-    except Exception as e:
-        print(f"❌ 日志测试失败: {e}")
-        return False
-
-def test_scanner():
-    """测试扫描器"""
-    print("🔍 测试文件扫描器...")
     
-    try:
-        from src.core.scanner import DirectoryScanner
+    def test_scanner(self):
+        """测试扫描器"""
+        print("🔍 测试文件扫描器...")
         
         # 创建临时测试目录
         test_dir = Path(__file__).parent / "test_temp"
         test_dir.mkdir(exist_ok=True)
+        self.addCleanup(shutil.rmtree, test_dir, ignore_errors=True)
         
         # 创建测试文件
         test_file = test_dir / "test.txt"
@@ -87,50 +74,26 @@ def test_scanner():
         files = scanner.scan_directory(recursive=False)
         
         print(f"✅ 扫描完成，找到 {len(files)} 个文件")
+        self.assertEqual(len(files), 1)
         
-        if files:
-            file_info = files[0]
-            print(f"   文件名: {file_info.name}")
-            print(f"   大小: {file_info.size} 字节")
-        
-        # 清理
-        import shutil
-        shutil.rmtree(test_dir)
-        
-        return True
-        
-    except Exception as e:
-        print(f"❌ 扫描器测试失败: {e}")
-        return False
+        file_info = files[0]
+        print(f"   文件名: {file_info.name}")
+        print(f"   大小: {file_info.size} 字节")
+        self.assertEqual(file_info.name, "test.txt")
 
 def main():
     """主测试函数"""
     print("🚀 FreeU基础功能测试")
     print("=" * 40)
     
-    tests = [
-        test_basic_imports,
-        test_config,
-        test_logging,
-        test_scanner
-    ]
-    
-    passed = 0
-    total = len(tests)
-    
-    for test in tests:
-        try:
-            if test():
-                passed += 1
-            print()
-        except Exception as e:
-            print(f"❌ 测试异常: {e}")
-            print()
+    result = unittest.main(exit=False, verbosity=0).result
+    total = result.testsRun
+    passed = total - len(result.failures) - len(result.errors)
     
     print("=" * 40)
     print(f"测试结果: {passed}/{total} 通过")
     
-    if passed == total:
+    if result.wasSuccessful():
         print("🎉 所有测试通过！基础功能正常")
         return True
     else:
@@ -3,69 +3,98 @@
 FreeU测试脚本
 """
 
+import os
 import unittest
 import tempfile
+from unittest import mock
 import shutil
 from pathlib import Path
 from src.core.scanner import DirectoryScanner, FileInfo
-from src.core.ai_engine import ClaudeAI, FileAction
+from src.core.ai_engine import ClaudeAI, FileAction, MultiAIEngine
 from src.core.file_executor import FileExecutor
 from src.utils.config import config
 
+def _materialize(root: Path, files: dict) -> None:
+    """按 {相对路径: 内容} 创建测试文件，每个文件一次 open/write/close"""
+    for rel_path, content in files.items():
+        path = os.path.join(root, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.write(fd, content)
+        finally:
+            os.close(fd)
+
 class TestDirectoryScanner(unittest.TestCase):
     """测试目录扫描器"""
     
-    def setUp(self):
-        """设置测试环境"""
-        self.test_dir = Path(tempfile.mkdtemp())
-        
-        # 创建测试文件
-        (self.test_dir / "test1.jpg").write_text("test image 1")
-        (self.test_dir / "test2.pdf").write_text("test document")
-        (self.test_dir / "test3.txt").write_text("test text file")
+    @classmethod
+    def setUpClass(cls):
+        """设置测试环境（各测试只读取目录，整个类共用一份）"""
+        cls.test_dir = Path(tempfile.mkdtemp())
+        cls.addClassCleanup(shutil.rmtree, cls.test_dir, ignore_errors=True)
         
-        # 创建子目录
-        sub_dir = self.test_dir / "subdir"
-        sub_dir.mkdir()
-        (sub_dir / "test4.png").write_text("test image in subdir")
+        # 创建测试文件和子目录
+        _materialize(cls.test_dir, {
+            "test1.jpg": b"test image 1",
+            "test2.pdf": b"test document",
+            "test3.txt": b"test text file",
+            "subdir/test4.png": b"test image in subdir",
+        })
         
-    def tearDown(self):
-        """清理测试环境"""
-        shutil.rmtree(self.test_dir)
+        # 递归与非递归各扫描一次，供各测试读取
+        cls.scanner = DirectoryScanner(cls.test_dir)
+        cls.files_recursive = cls.scanner.scan_directory(recursive=True)
+        cls.files_non_recursive = DirectoryScanner(cls.test_dir).scan_directory(recursive=False)
     
     def test_scan_directory(self):
         """测试目录扫描"""
-        scanner = DirectoryScanner(self.test_dir)
-        files = scanner.scan_directory(recursive=False)
+        files = self.files_non_recursive
         
         self.assertGreater(len(files), 0)
         
-        # 检查文件信息
+        # 检查文件信息（非递归扫描也会列出子目录，目录大小记为 0）
         for file_info in files:
             self.assertIsInstance(file_info, FileInfo)
             self.assertTrue(file_info.name)
             self.assertTrue(file_info.path)
-            self.assertGreater(file_info.size, 0)
+            if file_info.is_directory:
+                self.assertEqual(file_info.size, 0)
+            else:
+                self.assertGreater(file_info.size, 0)
+        self.assertIn("subdir", [f.name for f in files if f.is_directory])
     
     def test_scan_recursive(self):
         """测试递归扫描"""
-        scanner = DirectoryScanner(self.test_dir)
-        files_recursive = scanner.scan_directory(recursive=True)
-        files_non_recursive = scanner.scan_directory(recursive=False)
-        
-        # 递归扫描应该找到更多文件
-        self.assertGreater(len(files_recursive), len(files_non_recursive))
+        # 只比较文件数：递归扫描应该找到子目录中的文件
+        recursive_files = [f for f in self.files_recursive if not f.is_directory]
+        non_recursive_files = [f for f in self.files_non_recursive if not f.is_directory]
+        self.assertGreater(len(recursive_files), len(non_recursive_files))
+        self.assertIn("subdir/test4.png", [f.path.replace(os.sep, "/") for f in recursive_files])
     
     def test_file_summary(self):
         """测试文件摘要"""
-        scanner = DirectoryScanner(self.test_dir)
-        scanner.scan_directory(recursive=True)
-        summary = scanner.get_files_summary()
+        summary = self.scanner.get_files_summary()
         
         self.assertIn('total_files', summary)
         self.assertIn('total_size', summary)
         self.assertIn('extensions', summary)
         self.assertGreater(summary['total_files'], 0)
+    
+    @unittest.skipUnless(hasattr(os, "symlink"), "需要符号链接支持")
+    def test_symlink_outside_base_skipped(self):
+        """测试指向基础目录之外的符号链接（文件和目录）被跳过，指向目录内的文件链接保留"""
+        root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        _materialize(root, {"base/inside.txt": b"inside", "outside/secret.txt": b"outside"})
+        base = root / "base"
+        os.symlink(root / "outside" / "secret.txt", base / "out_link.txt")
+        os.symlink(root / "outside", base / "out_dir", target_is_directory=True)
+        os.symlink(base / "inside.txt", base / "in_link.txt")
+        
+        for recursive in (False, True):
+            names = sorted(f.name for f in DirectoryScanner(base).scan_directory(recursive=recursive))
+            self.assertEqual(names, ["in_link.txt", "inside.txt"])
 
 class TestAIEngine(unittest.TestCase):
     """测试AI引擎"""
@@ -123,6 +152,46 @@ class TestAIEngine(unittest.TestCase):
         except ValueError:
             # 如果没有配置API Key，应该抛出ValueError
             pass
+    
+    def test_expand_pattern_action(self):
+        """测试扩展名规则展开：保留子目录路径，跳过已在目标文件夹中的文件"""
+        files = self.test_files + [
+            FileInfo(name="photo.jpg", path="trip/photo.jpg", extension=".jpg", size=10,
+                     modified_time=None, is_directory=False),
+            FileInfo(name="old.jpg", path="Pictures/old.jpg", extension=".jpg", size=10,
+                     modified_time=None, is_directory=False),
+            FileInfo(name="README", path="README", extension="", size=10,
+                     modified_time=None, is_directory=False),
+            FileInfo(name="album.jpg", path="album.jpg", extension="", size=0,
+                     modified_time=None, is_directory=True),
+        ]
+        rule = FileAction(action_type="move", source="*.jpg", destination="Pictures/", reason="图片")
+        expanded = MultiAIEngine._expand_pattern_action(rule, files)
+        self.assertEqual(
+            [(a.source, a.destination) for a in expanded],
+            [("photo.jpg", "Pictures/photo.jpg"), ("trip/photo.jpg", "Pictures/trip/photo.jpg")]
+        )
+        self.assertTrue(all(a.reason == "图片" for a in expanded))
+        
+        # "*." 匹配没有扩展名的文件
+        rule = FileAction(action_type="move", source="*.", destination="Other", reason="其他")
+        expanded = MultiAIEngine._expand_pattern_action(rule, files)
+        self.assertEqual([(a.source, a.destination) for a in expanded], [("README", "Other/README")])
+    
+    def test_parse_response_dedup(self):
+        """测试解析响应时去掉重复的 (source, destination) 操作"""
+        result_data = {"actions": [
+            {"action_type": "move", "source": "photo.jpg", "destination": "Pictures/photo.jpg", "reason": "图片"},
+            {"action_type": "move", "source": "photo.jpg", "destination": "Pictures/photo.jpg", "reason": "重复"},
+            {"action_type": "move", "source": "photo.jpg", "destination": "Images/photo.jpg", "reason": "另一目标"},
+            {"action_type": "move", "source": "*.jpg", "destination": "Pictures/", "reason": "规则"},
+            {"action_type": "move", "source": "document.pdf"},
+        ]}
+        response = MultiAIEngine._parse_response(result_data, self.test_files)
+        self.assertEqual(
+            [(a.source, a.destination, a.reason) for a in response.actions],
+            [("photo.jpg", "Pictures/photo.jpg", "图片"), ("photo.jpg", "Images/photo.jpg", "另一目标")]
+        )
 
 class TestFileExecutor(unittest.TestCase):
     """测试文件执行器"""
@@ -130,6 +199,7 @@ class TestFileExecutor(unittest.TestCase):
     def setUp(self):
         """设置测试环境"""
         self.test_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.test_dir, ignore_errors=True)
         
         # 创建测试文件
         self.source_file = self.test_dir / "test_file.txt"
@@ -138,10 +208,6 @@ class TestFileExecutor(unittest.TestCase):
         # 创建执行器
         self.executor = FileExecutor(self.test_dir)
     
-    def tearDown(self):
-        """清理测试环境"""
-        shutil.rmtree(self.test_dir)
-    
     def test_is_path_safe(self):
         """测试路径安全性检查"""
         # 安全路径
@@ -152,16 +218,20 @@ class TestFileExecutor(unittest.TestCase):
         unsafe_path = self.test_dir / ".." / "unsafe.txt"
         self.assertFalse(self.executor._is_path_safe(unsafe_path))
     
-    def test_generate_unique_filename(self):
-        """测试生成唯一文件名"""
+    def test_claim_unique_path(self):
+        """测试占用唯一文件名"""
         # 创建已存在的文件
         existing_file = self.test_dir / "existing.txt"
         existing_file.write_text("content")
         
-        # 生成唯一文件名
-        new_path = self.executor._generate_unique_filename(existing_file)
-        self.assertNotEqual(new_path, existing_file)
-        self.assertTrue(new_path.name.startswith("existing_"))
+        # 已存在时改用带序号的名字，并创建空占位文件
+        new_path = self.executor._claim_unique_path(existing_file)
+        self.assertEqual(new_path, self.test_dir / "existing_1.txt")
+        self.assertEqual(new_path.read_bytes(), b"")
+        self.assertEqual(existing_file.read_text(), "content")
+        
+        # 占位文件已存在，再次占用得到下一个序号
+        self.assertEqual(self.executor._claim_unique_path(existing_file), self.test_dir / "existing_2.txt")
     
     def test_execute_single_action(self):
         """测试执行单个操作"""
@@ -194,6 +264,59 @@ class TestFileExecutor(unittest.TestCase):
         self.assertTrue(result["success"])
         self.assertFalse(self.source_file.exists())
         self.assertTrue((self.test_dir / "target" / "test_file.txt").exists())
+    
+    def _move(self, source: str, destination: str) -> FileAction:
+        return FileAction(action_type="move", source=source, destination=destination, reason="测试移动")
+    
+    def test_concurrent_moves_into_shared_directory(self):
+        """测试多个文件并发移动到同一个（尚不存在的）目标目录"""
+        names = [f"file_{i}.txt" for i in range(40)]
+        _materialize(self.test_dir, {name: name.encode() for name in names})
+        
+        results = self.executor.execute_actions([self._move(name, f"shared/{name}") for name in names], [])
+        
+        self.assertTrue(all(r["success"] for r in results))
+        self.assertEqual([r["destination"] for r in results], [os.path.join("shared", name) for name in names])
+        for name in names:
+            self.assertEqual((self.test_dir / "shared" / name).read_bytes(), name.encode())
+            self.assertFalse((self.test_dir / name).exists())
+    
+    def test_same_name_sources_get_unique_destinations(self):
+        """测试两个同名源文件移动到同一目标时，后到的改名为 name_1"""
+        _materialize(self.test_dir, {"a/dup.txt": b"from a", "b/dup.txt": b"from b"})
+        
+        results = self.executor.execute_actions(
+            [self._move("a/dup.txt", "target/dup.txt"), self._move("b/dup.txt", "target/dup.txt")], []
+        )
+        
+        self.assertTrue(all(r["success"] for r in results))
+        destinations = sorted(os.path.basename(r["destination"]) for r in results)
+        self.assertEqual(destinations, ["dup.txt", "dup_1.txt"])
+        self.assertEqual(sum(1 for r in results if r["warning"]), 1)
+        contents = {(self.test_dir / r["destination"]).read_bytes() for r in results}
+        self.assertEqual(contents, {b"from a", b"from b"})
+    
+    def test_missing_source(self):
+        """测试源文件不存在时返回失败且不创建目标"""
+        results = self.executor.execute_actions([self._move("missing.txt", "target/missing.txt")], [])
+        
+        self.assertFalse(results[0]["success"])
+        self.assertEqual(results[0]["error"], "源文件不存在")
+        self.assertFalse((self.test_dir / "target").exists())
+    
+    def test_failed_move_removes_placeholder(self):
+        """测试移动失败时删除已占用的目标占位文件"""
+        (self.test_dir / "target").mkdir()
+        action = self._move("test_file.txt", "target/test_file.txt")
+        source_path, destination_path = self.executor._prepare_action(action)
+        
+        with mock.patch("src.core.file_executor.os.replace", side_effect=PermissionError("denied")):
+            result = self.executor._move_file(action, source_path, destination_path)
+        
+        self.assertFalse(result["success"])
+        self.assertIn("denied", result["error"])
+        self.assertFalse(destination_path.exists())
+        self.assertTrue(self.source_file.exists())
 
 def run_tests():
     """运行所有测试"""